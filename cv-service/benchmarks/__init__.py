@@ -0,0 +1,5 @@
+# cv-service/benchmarks/__init__.py
+
+# What it does: Performance benchmarks for the analysis engine (not imported by the service)
+# Think of it as: The stopwatch kept in the coach's bag
+# Run from cv-service/ - see replay.py
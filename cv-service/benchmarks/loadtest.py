@@ -0,0 +1,353 @@
+# cv-service/benchmarks/loadtest.py
+
+# What it does: Opens N simulated trainees against a running cv-service and measures how it holds up
+# Think of it as: Filling the gym with test users to find out how many one trainer can handle
+# Run from cv-service/:  python -m benchmarks.loadtest --clients 50 --fps 15 --duration 60
+#
+# - Without --url it starts a local uvicorn (main:app) with MONGO_URL=mongomock:// (in-memory MongoDB stand-in)
+# - /api/workout/ws/analyze clients: init -> landmarks at --fps (synthetic, see synthetic.py) -> reset every --reset-every s
+# - /exercise/live-analysis clients (--live N): synthetic JPEG frames of the same skeletons
+# - Reports feedback latency p50/p90/p99/max, error rate, achieved fps and server RSS (start/peak/end, per client)
+#
+# Latency is measured send -> matching feedback with `ingest=ordered` (the default): every message gets a reply.
+# With --ingest latest replaced frames are skipped using the server's dropped-frame count.
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import deque
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import websockets
+
+from modules.exercise_analyzer import Exercise
+from .synthetic import generate
+
+
+SKELETON_EDGES = ((11, 12), (11, 13), (13, 15), (12, 14), (14, 16), (11, 23), (12, 24), (23, 24),
+                  (23, 25), (25, 27), (24, 26), (26, 28))
+
+
+class ClientStats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+        self.dropped = 0
+        self.latencies: List[float] = []
+        self.failures: List[str] = []
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """Resident set size of `pid` in bytes (psutil if installed, else /proc)."""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def render_jpegs(exercise: Exercise, frames: int, size=(640, 480), quality: int = 80) -> List[str]:
+    """Base64 JPEGs of the synthetic skeleton - decodable frames with a person-like figure in them."""
+    width, height = size
+    images = []
+    for landmarks in generate(exercise, frames=frames).landmarks:
+        canvas = np.full((height, width, 3), 90, np.uint8)
+        pixels = (landmarks[:, :2] * (width, height)).astype(int)
+        for a, b in SKELETON_EDGES:
+            cv2.line(canvas, tuple(pixels[a]), tuple(pixels[b]), (230, 210, 190), 14)
+        cv2.circle(canvas, tuple(pixels[0]), 22, (200, 180, 170), -1)
+        _, buffer = cv2.imencode(".jpg", canvas, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        images.append(base64.b64encode(buffer).decode("ascii"))
+    return images
+
+
+class PendingFrames:
+    """Send times of frames still waiting for feedback, in order."""
+
+    def __init__(self):
+        self.sent: deque = deque()
+        self.dropped_seen = 0
+
+    def answer(self, dropped_total: int = 0) -> Optional[float]:
+        """Send time of the frame this feedback answers; skips frames the server replaced."""
+        if not self.sent:
+            return None
+        answered = self.sent.popleft()
+        for _ in range(min(max(0, dropped_total - self.dropped_seen), len(self.sent) - 1)):
+            self.sent.popleft()  # replaced while queued behind `answered`; the newest one is still pending
+        self.dropped_seen = dropped_total
+        return answered
+
+
+async def analyze_client(url: str, exercise: Exercise, seed: int, args, stats: ClientStats, stop: asyncio.Event):
+    frames = generate(exercise, frames=int(args.fps * 8), fps=args.fps, seed=seed).frame_messages()
+    pending = PendingFrames()
+    async with websockets.connect(f"{url}/api/workout/ws/analyze", max_size=None) as ws:
+        await ws.send(json.dumps({"type": "init", "exercise": exercise.value, "targetReps": 10_000,
+                                  "targetTime": 10_000, "ingest": args.ingest}))
+        reply = json.loads(await ws.recv())
+        if reply.get("type") != "init_success":
+            stats.errors += 1
+            stats.failures.append(f"init: {reply.get('message')}")
+            return
+
+        async def receive():
+            async for raw in ws:
+                message = json.loads(raw)
+                kind = message.get("type")
+                if kind == "feedback":
+                    sent_at = pending.answer(message.get("droppedFrames", 0))
+                    stats.dropped = message.get("droppedFrames", 0)
+                    if sent_at is not None:
+                        stats.latencies.append(time.perf_counter() - sent_at)
+                    stats.received += 1
+                elif kind == "error":
+                    stats.errors += 1
+                    stats.failures.append(message.get("message", ""))
+
+        receiver = asyncio.create_task(receive())
+        interval = 1.0 / args.fps
+        next_send = time.perf_counter()
+        last_reset = next_send
+        index = 0
+        try:
+            while not stop.is_set():
+                now = time.perf_counter()
+                if args.reset_every and now - last_reset >= args.reset_every:
+                    await ws.send(json.dumps({"type": "reset"}))
+                    last_reset = now
+                pending.sent.append(time.perf_counter())
+                await ws.send(json.dumps({"type": "landmarks", "landmarks": frames[index % len(frames)],
+                                          "timestamp": time.time() * 1000}))
+                stats.sent += 1
+                index += 1
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            await asyncio.sleep(args.drain)
+        finally:
+            receiver.cancel()
+
+
+async def live_client(url: str, exercise: Exercise, images: List[str], args, stats: ClientStats,
+                      stop: asyncio.Event):
+    pending = PendingFrames()
+    query = f"ingest={args.ingest}&running_mode={args.running_mode}"
+    async with websockets.connect(f"{url}/exercise/live-analysis?{query}", max_size=None) as ws:
+        session = json.loads(await ws.recv())
+        if session.get("type") != "session":
+            stats.errors += 1
+            stats.failures.append(f"session: {session.get('message')}")
+            return
+
+        async def receive():
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") == "feedback":
+                    sent_at = pending.answer(message.get("dropped_frames", 0))
+                    stats.dropped = message.get("dropped_frames", 0)
+                    if sent_at is not None:
+                        stats.latencies.append(time.perf_counter() - sent_at)
+                    stats.received += 1
+                elif message.get("type") == "error":
+                    pending.answer()
+                    stats.errors += 1
+                    stats.failures.append(message.get("message", ""))
+
+        receiver = asyncio.create_task(receive())
+        interval = 1.0 / args.fps
+        next_send = time.perf_counter()
+        index = 0
+        try:
+            while not stop.is_set():
+                pending.sent.append(time.perf_counter())
+                await ws.send(json.dumps({"type": "frame", "exercise": exercise.name, "data": images[index % len(images)]}))
+                stats.sent += 1
+                index += 1
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            await asyncio.sleep(args.drain)
+        finally:
+            receiver.cancel()
+
+
+async def guarded(client, stats: ClientStats, *args):
+    try:
+        await client(*args)
+    except Exception as e:
+        stats.errors += 1
+        stats.failures.append(f"{type(e).__name__}: {e}")
+
+
+async def run_load(url: str, args, server_pid: Optional[int]) -> Dict:
+    exercises = [Exercise[name] for name in args.exercise] if args.exercise else list(Exercise)
+    live_images = {}
+    if args.live:
+        live_images = {exercise: render_jpegs(exercise, frames=int(args.fps * 4)) for exercise in exercises}
+
+    stop = asyncio.Event()
+    groups: Dict[str, List[ClientStats]] = {"analyze": [], "live": []}
+    tasks = []
+    rss = {"start": read_rss(server_pid) if server_pid else None, "peak": 0, "samples": []}
+    ramp_step = args.ramp / max(1, args.clients + args.live)
+
+    for i in range(args.clients + args.live):
+        exercise = exercises[i % len(exercises)]
+        stats = ClientStats()
+        if i < args.clients:
+            groups["analyze"].append(stats)
+            tasks.append(asyncio.create_task(guarded(analyze_client, stats, url, exercise, i, args, stats, stop)))
+        else:
+            groups["live"].append(stats)
+            tasks.append(asyncio.create_task(guarded(live_client, stats, url, exercise, live_images[exercise],
+                                                     args, stats, stop)))
+        await asyncio.sleep(ramp_step)
+
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration:
+        if server_pid:
+            current = read_rss(server_pid)
+            if current:
+                rss["peak"] = max(rss["peak"], current)
+                rss["samples"].append(current)
+        await asyncio.sleep(1.0)
+    stop.set()
+    await asyncio.gather(*tasks)
+    rss["end"] = read_rss(server_pid) if server_pid else None
+
+    report = {"url": url, "duration_s": args.duration, "fps_per_client": args.fps, "ingest": args.ingest,
+              "endpoints": {}}
+    for name, clients in groups.items():
+        if clients:
+            report["endpoints"][name] = summarize(clients, args.duration)
+    if server_pid:
+        load_clients = max(1, args.clients + args.live)
+        report["server_rss_mib"] = {
+            "start": _mib(rss["start"]), "peak": _mib(rss["peak"]), "end": _mib(rss["end"]),
+            "per_client": _mib((rss["peak"] - rss["start"]) / load_clients) if rss["start"] and rss["peak"] else None,
+        }
+    return report
+
+
+def _mib(value) -> Optional[float]:
+    return None if not value else round(value / 2 ** 20, 2)
+
+
+def summarize(clients: List[ClientStats], duration: float) -> Dict:
+    latencies = np.asarray([lat for c in clients for lat in c.latencies]) * 1000
+    sent = sum(c.sent for c in clients)
+    errors = sum(c.errors for c in clients)
+    failures: Dict[str, int] = {}
+    for c in clients:
+        for failure in c.failures:
+            failures[failure[:120]] = failures.get(failure[:120], 0) + 1
+    summary = {
+        "clients": len(clients),
+        "sent": sent,
+        "received": sum(c.received for c in clients),
+        "dropped": sum(c.dropped for c in clients),
+        "errors": errors,
+        "error_rate": round(errors / sent, 4) if sent else None,
+        "feedback_fps": round(sum(c.received for c in clients) / duration, 1),
+        "top_errors": sorted(failures.items(), key=lambda item: -item[1])[:5],
+    }
+    if len(latencies):
+        summary.update({f"p{p}_ms": round(float(np.percentile(latencies, p)), 2) for p in (50, 90, 99)})
+        summary["max_ms"] = round(float(latencies.max()), 2)
+    return summary
+
+
+def start_server(port: int, show_log: bool = False) -> subprocess.Popen:
+    """uvicorn main:app on localhost with the in-memory MongoDB stand-in."""
+    env = dict(os.environ, MONGO_URL="mongomock://localhost")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env,
+        stdout=None if show_log else subprocess.DEVNULL, stderr=None if show_log else subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 60s")
+
+
+def print_report(report: Dict):
+    print(f"target {report['url']}  {report['duration_s']}s @ {report['fps_per_client']} fps/client ({report['ingest']})")
+    for name, s in report["endpoints"].items():
+        print(f"  {name:<8} clients={s['clients']} sent={s['sent']} received={s['received']} dropped={s['dropped']} "
+              f"errors={s['errors']} error_rate={s['error_rate']} feedback_fps={s['feedback_fps']}")
+        if "p50_ms" in s:
+            print(f"           latency ms p50={s['p50_ms']} p90={s['p90_ms']} p99={s['p99_ms']} max={s['max_ms']}")
+        for message, count in s["top_errors"]:
+            print(f"           {count}x {message}")
+    if "server_rss_mib" in report:
+        r = report["server_rss_mib"]
+        print(f"  server RSS MiB start={r['start']} peak={r['peak']} end={r['end']} per_client={r['per_client']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="WebSocket load generator for cv-service")
+    parser.add_argument("--url", help="ws://host:port of a running server (default: start a local uvicorn)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the local server")
+    parser.add_argument("--clients", type=int, default=20, help="/api/workout/ws/analyze clients")
+    parser.add_argument("--live", type=int, default=0, help="/exercise/live-analysis clients (synthetic JPEGs)")
+    parser.add_argument("--fps", type=float, default=15.0, help="Frames per second per client")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of steady load after ramp-up")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which clients connect")
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to wait for late feedback at the end")
+    parser.add_argument("--reset-every", type=float, default=20.0, help="Send a reset every N seconds (0 = never)")
+    parser.add_argument("--ingest", choices=["ordered", "latest"], default="ordered")
+    parser.add_argument("--running-mode", default="video", help="live-analysis running_mode")
+    parser.add_argument("--exercise", action="append", choices=[e.name for e in Exercise],
+                        help="Exercises to spread clients over (repeatable; default all)")
+    parser.add_argument("--server-log", action="store_true", help="Show the local server's output")
+    parser.add_argument("--json", dest="json_path", help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_server(args.port, args.server_log)
+        url = f"ws://127.0.0.1:{args.port}"
+    try:
+        report = asyncio.run(run_load(url.rstrip("/"), args, server.pid if server else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# cv-service/benchmarks/replay.py
+
+# What it does: Replays landmark recordings through the analysis engine and the /ws/analyze protocol and reports speed
+# Think of it as: A treadmill test for the analyzers - same workout every time, so slower results mean a regression
+# Run from cv-service/:  python -m benchmarks.replay [--json out.json] [--compare baseline.json]
+#
+# Targets:
+#   engine  - ExerciseAnalyzer.analyze_pose, one call per frame (the per-session hot path)
+#   batch   - analyze_pose_batch over --sessions sessions per tick
+#   ws      - /api/workout/ws/analyze through an in-process ASGI client (JSON encode/decode, queueing, send)
+# Reported per exercise and target:
+#   fps_per_core   - frames analyzed per CPU-second of this process
+#   p50_ms/p99_ms  - per-frame latency (ws: landmarks sent -> feedback received)
+#   kib_per_session- memory held by one live analyzer after replaying (engine only; tracemalloc)
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from modules.exercise_analyzer import ExerciseAnalyzer, Exercise, analyze_pose_batch
+from .synthetic import Recording, generate, load_recording
+
+
+TARGETS = ("engine", "batch", "ws")
+REGRESSION_THRESHOLD = 0.15  # --compare fails when fps drops or p99 grows by more than this fraction
+
+
+def _percentiles(samples_s: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples_s) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 4), "p99_ms": round(float(np.percentile(ms, 99)), 4)}
+
+
+def bench_engine(recording: Recording, repeat: int = 3) -> Dict:
+    """Replay the recording through fresh analyzers, timing every analyze_pose call."""
+    latencies: List[float] = []
+    reps = 0
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        analyzer = ExerciseAnalyzer()
+        for landmarks, timestamp in zip(recording.landmarks, recording.timestamps.tolist()):
+            started = time.perf_counter()
+            analyzer.analyze_pose(landmarks, recording.exercise, timestamp)
+            latencies.append(time.perf_counter() - started)
+        reps = analyzer.rep_count
+    cpu = time.process_time() - cpu_start
+    return {"frames": len(latencies), "fps_per_core": round(len(latencies) / cpu, 1), **_percentiles(latencies),
+            "reps": reps, "kib_per_session": round(session_memory(recording) / 1024, 1)}
+
+
+def bench_batch(recording: Recording, sessions: int = 64) -> Dict:
+    """One analyze_pose_batch call per frame for `sessions` analyzers replaying the same recording."""
+    analyzers = [ExerciseAnalyzer() for _ in range(sessions)]
+    exercises = [recording.exercise] * sessions
+    latencies: List[float] = []
+    cpu_start = time.process_time()
+    for landmarks, timestamp in zip(recording.landmarks, recording.timestamps.tolist()):
+        started = time.perf_counter()
+        analyze_pose_batch(analyzers, [landmarks] * sessions, exercises, [timestamp] * sessions)
+        latencies.append((time.perf_counter() - started) / sessions)
+    cpu = time.process_time() - cpu_start
+    frames = len(latencies) * sessions
+    return {"frames": frames, "sessions": sessions, "fps_per_core": round(frames / cpu, 1),
+            **_percentiles(latencies), "reps": analyzers[0].rep_count}
+
+
+def session_memory(recording: Recording, sessions: int = 20) -> float:
+    """Bytes retained per analyzer after replaying the recording (history lists, buffers, ...)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    analyzers = [ExerciseAnalyzer() for _ in range(sessions)]
+    for analyzer in analyzers:
+        for landmarks, timestamp in zip(recording.landmarks, recording.timestamps.tolist()):
+            analyzer.analyze_pose(landmarks, recording.exercise, timestamp)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del analyzers
+    return retained / sessions
+
+
+def bench_ws(recording: Recording, client) -> Dict:
+    """Drive one /ws/analyze session (init -> landmarks... -> reset) and time each feedback round trip."""
+    messages = recording.frame_messages()
+    latencies: List[float] = []
+    reps = 0
+    cpu_start = time.process_time()
+    with client.websocket_connect("/api/workout/ws/analyze") as ws:
+        ws.send_json({"type": "init", "exercise": recording.exercise.value, "targetReps": 1000,
+                      "targetTime": 1000, "ingest": "ordered"})
+        ws.receive_json()
+        for landmarks, timestamp in zip(messages, recording.timestamps.tolist()):
+            started = time.perf_counter()
+            ws.send_json({"type": "landmarks", "landmarks": landmarks, "timestamp": timestamp * 1000})
+            response = ws.receive_json()
+            latencies.append(time.perf_counter() - started)
+            reps = response.get("repCount", reps)
+        ws.send_json({"type": "reset"})
+        ws.receive_json()
+    # The ASGI app runs in a thread of this process, so CPU time covers client and server
+    cpu = time.process_time() - cpu_start
+    return {"frames": len(latencies), "fps_per_core": round(len(latencies) / cpu, 1), **_percentiles(latencies),
+            "reps": reps}
+
+
+def run(recordings: List[Recording], targets: List[str], repeat: int, sessions: int) -> Dict:
+    results: Dict[str, Dict[str, Dict]] = {}
+    client = None
+    if "ws" in targets:
+        import logging
+        from fastapi.testclient import TestClient
+        import main
+        for name in ("modules.exercise_websocket", "cv.hotpath"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+        client = TestClient(main.app)  # no lifespan: /ws/analyze needs no MongoDB
+
+    for recording in recordings:
+        row = results.setdefault(recording.exercise.name, {})
+        if "engine" in targets:
+            row["engine"] = bench_engine(recording, repeat)
+        if "batch" in targets:
+            row["batch"] = bench_batch(recording, sessions)
+        if "ws" in targets:
+            row["ws"] = bench_ws(recording, client)
+    return {
+        "meta": {"python": sys.version.split()[0], "numpy": np.__version__, "cpus": os.cpu_count(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Regressions of `report` against `baseline`: fps down or p99 up by more than `threshold`."""
+    problems = []
+    for exercise, row in report["results"].items():
+        for target, current in row.items():
+            previous = baseline.get("results", {}).get(exercise, {}).get(target)
+            if not previous:
+                continue
+            if current["fps_per_core"] < previous["fps_per_core"] * (1 - threshold):
+                problems.append(f"{exercise}/{target}: fps_per_core {previous['fps_per_core']} -> {current['fps_per_core']}")
+            if current["p99_ms"] > previous["p99_ms"] * (1 + threshold):
+                problems.append(f"{exercise}/{target}: p99_ms {previous['p99_ms']} -> {current['p99_ms']}")
+    return problems
+
+
+def print_report(report: Dict):
+    print(f"{'exercise':<14} {'target':<7} {'frames':>7} {'fps/core':>10} {'p50 ms':>8} {'p99 ms':>8} {'KiB/sess':>9} {'reps':>5}")
+    for exercise, row in report["results"].items():
+        for target, r in row.items():
+            memory = r.get("kib_per_session")
+            print(f"{exercise:<14} {target:<7} {r['frames']:>7} {r['fps_per_core']:>10.1f} {r['p50_ms']:>8.3f} "
+                  f"{r['p99_ms']:>8.3f} {'' if memory is None else memory:>9} {r['reps']:>5}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay benchmark for the exercise analysis engine")
+    parser.add_argument("recordings", nargs="*", help="Recording files (.jsonl[.gz]); default: synthetic, every exercise")
+    parser.add_argument("--exercise", action="append", choices=[e.name for e in Exercise],
+                        help="Synthetic exercises to run (repeatable; default all)")
+    parser.add_argument("--frames", type=int, default=600, help="Frames per synthetic recording")
+    parser.add_argument("--targets", default="engine,batch,ws", help=f"Comma-separated subset of {','.join(TARGETS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Engine replays per recording")
+    parser.add_argument("--sessions", type=int, default=64, help="Sessions per batch tick")
+    parser.add_argument("--json", dest="json_path", help="Write the report as JSON")
+    parser.add_argument("--compare", help="Baseline JSON report; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    targets = [t for t in args.targets.split(",") if t]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    if args.recordings:
+        recordings = [load_recording(path) for path in args.recordings]
+    else:
+        names = args.exercise or [e.name for e in Exercise]
+        recordings = [generate(Exercise[name], frames=args.frames) for name in names]
+
+    report = run(recordings, targets, args.repeat, args.sessions)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.threshold)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+# cv-service/benchmarks/synthetic.py
+
+# What it does: Generates believable landmark sequences for every Exercise, and reads/writes landmark recordings
+# Think of it as: A crash-test dummy that does squats on demand, plus a tape recorder for real sessions
+# Deterministic (seeded), so two benchmark runs replay exactly the same frames
+#
+# Recording format (.jsonl, or .jsonl.gz):
+#   line 1:  {"format": "mypt-landmarks", "version": 1, "exercise": "SQUAT", "fps": 30, "frames": 300}
+#   line 2+: {"t": <ms since start>, "landmarks": [[x, y, z, visibility], ... 33 entries]}
+# The landmark lists are exactly what the frontend sends in a `landmarks` WebSocket message,
+# so a session can be recorded client-side and replayed here unchanged.
+
+import gzip
+import json
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from modules.exercise_analyzer import Exercise, NUM_LANDMARKS
+
+
+RECORDING_FORMAT = "mypt-landmarks"
+RECORDING_VERSION = 1
+
+# Limb segment lengths in normalized image units (a person filling ~70% of the frame height)
+UPPER_ARM = 0.13
+FOREARM = 0.12
+THIGH = 0.17
+SHIN = 0.17
+TORSO = 0.30
+
+
+@dataclass
+class Recording:
+    exercise: Exercise
+    fps: float
+    landmarks: np.ndarray  # (F, 33, 4): x, y, z, visibility
+    timestamps: np.ndarray  # (F,) seconds since start
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    def frame_messages(self) -> List[List[Dict]]:
+        """Per-frame landmark lists in the WebSocket JSON shape."""
+        keys = ("x", "y", "z", "visibility")
+        return [[dict(zip(keys, point)) for point in frame] for frame in self.landmarks.tolist()]
+
+
+def _at(origin, direction_deg: float, length: float) -> np.ndarray:
+    """Point `length` away from `origin`; 0 deg = +x (right), 90 deg = +y (down the image)."""
+    rad = math.radians(direction_deg)
+    return np.asarray(origin, dtype=np.float64) + length * np.array([math.cos(rad), math.sin(rad)])
+
+
+def _skeleton(joints: Dict[int, np.ndarray]) -> np.ndarray:
+    """(33, 4) array from the major joints; face, hand and foot landmarks are placed around them."""
+    lm = np.zeros((NUM_LANDMARKS, 4))
+    lm[:, 3] = 0.95
+    for index, xy in joints.items():
+        lm[index, :2] = xy
+
+    nose = lm[0, :2]
+    for index, (dx, dy) in zip(range(1, 11), [(-0.010, -0.012), (-0.015, -0.013), (-0.020, -0.012),
+                                             (0.010, -0.012), (0.015, -0.013), (0.020, -0.012),
+                                             (-0.030, -0.005), (0.030, -0.005), (-0.008, 0.015), (0.008, 0.015)]):
+        lm[index, :2] = nose + (dx, dy)
+    for wrist, first in ((15, 17), (16, 18)):  # pinky, index, thumb
+        for k, (dx, dy) in enumerate([(0.015, 0.02), (0.0, 0.025), (-0.012, 0.015)]):
+            lm[first + 2 * k, :2] = lm[wrist, :2] + (dx, dy)
+    for ankle, heel, toe in ((27, 29, 31), (28, 30, 32)):
+        lm[heel, :2] = lm[ankle, :2] + (-0.015, 0.02)
+        lm[toe, :2] = lm[ankle, :2] + (0.03, 0.025)
+    lm[7:11, 3] = 0.8  # ears/mouth are less certain, like real detector output
+    return lm
+
+
+def _phase(frame: int, period: int) -> float:
+    """0 at rest -> 1 at the peak of a rep -> 0, smoothly."""
+    return 0.5 - 0.5 * math.cos(2 * math.pi * frame / period)
+
+
+def _lerp(a: float, b: float, s: float) -> float:
+    return a + (b - a) * s
+
+
+def squat_pose(s: float) -> np.ndarray:
+    """Front view; knees bend outward from 175 to ~85 degrees while the hips sit back."""
+    half_bend = _lerp(2.5, 47.5, s)  # knee angle = 180 - 2 * half_bend
+    joints = {}
+    for side, ankle_x, out in ((0, 0.45, -1), (1, 0.55, 1)):
+        ankle = np.array([ankle_x, 0.90])
+        knee = _at(ankle, -90 + out * half_bend, SHIN)
+        hip = _at(knee, -90 - out * half_bend, THIGH)
+        hip[0] += 0.03 * s  # hips back
+        joints[27 + side], joints[25 + side], joints[23 + side] = ankle, knee, hip
+    for side, out in ((0, -1), (1, 1)):
+        hip = joints[23 + side]
+        shoulder = hip + (out * 0.03 + 0.03 * s, -TORSO)
+        joints[11 + side] = shoulder
+        joints[13 + side] = _at(shoulder, 90 - out * 10, UPPER_ARM)
+        joints[15 + side] = _at(joints[13 + side], 90 - out * 30, FOREARM)
+    joints[0] = (joints[11] + joints[12]) / 2 + (0, -0.08)
+    return _skeleton(joints)
+
+
+def pushup_pose(s: float) -> np.ndarray:
+    """Three-quarter side view; hands on the floor, elbows from 170 to ~85 degrees, body rigid."""
+    elbow_angle = _lerp(170, 85, s)
+    joints = {}
+    for side, depth in ((0, 0.0), (1, 0.08)):
+        wrist = np.array([0.30 + depth, 0.80 + depth * 0.1])
+        elbow = _at(wrist, -90, FOREARM)
+        shoulder = _at(elbow, -90 + (180 - elbow_angle), UPPER_ARM)
+        ankle = np.array([0.82 + depth, 0.78 + depth * 0.1])
+        hip = shoulder + (ankle - shoulder) * 0.5
+        joints[15 + side], joints[13 + side], joints[11 + side] = wrist, elbow, shoulder
+        joints[27 + side], joints[23 + side] = ankle, hip
+        joints[25 + side] = shoulder + (ankle - shoulder) * 0.75
+    joints[0] = joints[11] + (-0.07, 0.01)
+    return _skeleton(joints)
+
+
+def leg_raise_pose(s: float) -> np.ndarray:
+    """Lying on the back, straight legs lifted from ~5 to ~80 degrees."""
+    elevation = _lerp(5, 80, s)
+    joints = {}
+    for side, depth in ((0, 0.0), (1, 0.01)):
+        shoulder = np.array([0.25 + depth, 0.78])
+        hip = np.array([0.55 + depth, 0.78])
+        knee = _at(hip, -elevation, 0.21)
+        ankle = _at(hip, -elevation, 0.42)
+        joints[11 + side], joints[23 + side], joints[25 + side], joints[27 + side] = shoulder, hip, knee, ankle
+        joints[13 + side] = shoulder + (0.12, 0.01)
+        joints[15 + side] = shoulder + (0.24, 0.015)
+    joints[0] = joints[11] + (-0.08, -0.01)
+    return _skeleton(joints)
+
+
+def dumbbell_curl_pose(s: float) -> np.ndarray:
+    """Front view, standing; the left forearm curls from 170 to ~45 degrees, the right arm hangs."""
+    elbow_angle = _lerp(170, 45, s)
+    joints = {}
+    for side, x, out in ((0, 0.42, -1), (1, 0.58, 1)):
+        shoulder = np.array([x, 0.30])
+        elbow = _at(shoulder, 90, UPPER_ARM)
+        bend = 180 - (elbow_angle if side == 0 else 175)
+        wrist = _at(elbow, 90 + out * bend, FOREARM)
+        hip = np.array([x + 0.02 * -out, 0.60])
+        knee = hip + (0, THIGH)
+        ankle = knee + (0, SHIN)
+        joints[11 + side], joints[13 + side], joints[15 + side] = shoulder, elbow, wrist
+        joints[23 + side], joints[25 + side], joints[27 + side] = hip, knee, ankle
+    joints[0] = (joints[11] + joints[12]) / 2 + (0, -0.09)
+    return _skeleton(joints)
+
+
+def one_arm_row_pose(s: float) -> np.ndarray:
+    """Side view, torso bent over horizontally; the left elbow rows from hanging to above the back."""
+    lift = _lerp(0, 120, s)  # upper arm angle away from hanging straight down
+    joints = {}
+    for side, depth in ((0, 0.0), (1, 0.02)):
+        shoulder = np.array([0.35 + depth, 0.45 + depth * 0.5])
+        hip = shoulder + (0.27, 0.02)
+        knee = hip + (0.02, THIGH)
+        ankle = knee + (0.0, SHIN)
+        joints[11 + side], joints[23 + side], joints[25 + side], joints[27 + side] = shoulder, hip, knee, ankle
+    elbow = _at(joints[11], 90 - lift, UPPER_ARM)
+    joints[13], joints[15] = elbow, elbow + (0, FOREARM)  # the dumbbell hangs straight down
+    joints[14] = joints[12] + (0, 0.17)  # supporting arm on the bench
+    joints[16] = joints[14] + (0, 0.12)
+    joints[0] = joints[11] + (-0.08, 0.0)
+    return _skeleton(joints)
+
+
+def plank_pose(s: float) -> np.ndarray:
+    """Forearm plank, side/front view mix; `s` only adds a slight breathing sway of the hips."""
+    joints = {}
+    for side, depth in ((0, 0.0), (1, 0.16)):
+        shoulder = np.array([0.30 + depth, 0.55])
+        ankle = np.array([0.80 + depth, 0.62])
+        hip = shoulder + (ankle - shoulder) * 0.5 + (0, 0.005 * s)
+        joints[11 + side], joints[23 + side], joints[27 + side] = shoulder, hip, ankle
+        joints[25 + side] = shoulder + (ankle - shoulder) * 0.75
+        joints[13 + side] = shoulder + (0.0, 0.18)
+        joints[15 + side] = joints[13 + side] + (-0.10, 0.0)
+    mid_shoulder = (joints[11] + joints[12]) / 2
+    mid_hip = (joints[23] + joints[24]) / 2
+    joints[0] = np.array([mid_shoulder[0] + 0.2 * (mid_hip[0] - mid_shoulder[0]), mid_shoulder[1] - 0.03])
+    return _skeleton(joints)
+
+
+POSES: Dict[Exercise, Callable[[float], np.ndarray]] = {
+    Exercise.PUSHUP: pushup_pose,
+    Exercise.SQUAT: squat_pose,
+    Exercise.LEG_RAISE: leg_raise_pose,
+    Exercise.DUMBBELL_CURL: dumbbell_curl_pose,
+    Exercise.ONE_ARM_ROW: one_arm_row_pose,
+    Exercise.PLANK: plank_pose,
+}
+
+
+def generate(exercise: Exercise, frames: int = 300, fps: float = 30.0, rep_seconds: float = 2.0,
+             noise: float = 0.002, seed: int = 0) -> Recording:
+    """
+    Synthetic recording: repeated reps (a hold for PLANK) with detector-like jitter.
+
+    Args:
+        exercise: Which motion to generate
+        frames: Number of frames
+        fps: Frame rate the timestamps are spaced at
+        rep_seconds: Duration of one rep
+        noise: Std-dev of the positional jitter (normalized units)
+        seed: RNG seed - the same arguments always give the same recording
+    """
+    rng = np.random.default_rng(seed)
+    period = max(2, int(round(rep_seconds * fps)))
+    pose = POSES[exercise]
+    landmarks = np.stack([pose(_phase(i, period)) for i in range(frames)])
+    landmarks[..., :2] += rng.normal(0.0, noise, size=landmarks[..., :2].shape)
+    landmarks[..., 2] = rng.normal(0.0, 0.05, size=landmarks.shape[:2])
+    landmarks[..., 3] = np.clip(landmarks[..., 3] + rng.normal(0.0, 0.02, size=landmarks.shape[:2]), 0.0, 1.0)
+    return Recording(exercise, fps, landmarks, np.arange(frames) / fps)
+
+
+def save_recording(recording: Recording, path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "format": RECORDING_FORMAT,
+            "version": RECORDING_VERSION,
+            "exercise": recording.exercise.name,
+            "fps": recording.fps,
+            "frames": len(recording),
+        }) + "\n")
+        for t, frame in zip(recording.timestamps.tolist(), recording.landmarks.tolist()):
+            f.write(json.dumps({"t": round(t * 1000, 3), "landmarks": frame}) + "\n")
+
+
+def load_recording(path: str) -> Recording:
+    """Read a recording; frame landmarks may be [x, y, z, v] lists or {"x", "y", "z", "visibility"} dicts."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != RECORDING_FORMAT:
+            raise ValueError(f"{path}: not a {RECORDING_FORMAT} recording")
+        timestamps, frames = [], []
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            timestamps.append(record["t"] / 1000)
+            points = record["landmarks"]
+            if points and isinstance(points[0], dict):
+                points = [(p.get("x", 0), p.get("y", 0), p.get("z", 0), p.get("visibility", 1.0)) for p in points]
+            frames.append(points)
+    name = header["exercise"]
+    exercise = Exercise[name] if name in Exercise.__members__ else Exercise(name)
+    return Recording(exercise, float(header.get("fps", 30)), np.asarray(frames, dtype=np.float64).reshape(-1, NUM_LANDMARKS, 4),
+                     np.asarray(timestamps))
+
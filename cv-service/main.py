@@ -1,6 +1,7 @@
 # cv-service/main.py
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os
@@ -13,15 +14,24 @@ from modules.exercise_websocket import router as websocket_router  # NEW!
 
 from modules.workout_routine_api import router as workout_router
 from modules.workout_routine_api import connect_to_mongo, close_mongo_connection
+from modules.pose_model_pool import pose_model_pool, video_pose_model_pool
+from modules.frame_executor import frame_executor
+from modules.hot_path_logging import start_log_listener, stop_log_listener
+from modules.metrics import registry, Gauge
 
 # Lifespan context manager for startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    start_log_listener()  # hot-path log records are written from a background thread
     await connect_to_mongo()
     yield
     # Shutdown
     await close_mongo_connection()
+    frame_executor.shutdown()
+    pose_model_pool.close()
+    video_pose_model_pool.close()
+    stop_log_listener()
 
 
 # Create FastAPI app
@@ -60,7 +70,8 @@ async def root():
             "exercise": "/exercise",
             "websocket": "/api/workout/ws",  # NEW!
             "docs": "/docs",
-            "health": "/health"
+            "health": "/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -77,6 +88,22 @@ async def health_check():
     }
 
 
+# Pose detector pools, read at scrape time
+registry.register(Gauge(
+    "cv_pose_detectors", "Pose detectors per pool and state", ("pool", "state"),
+    callback=lambda: {
+        (pool.running_mode, state): pool.stats()[state]
+        for pool in (pose_model_pool, video_pose_model_pool)
+        for state in ("in_use", "idle")
+    }
+))
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     # Run the server
     uvicorn.run(
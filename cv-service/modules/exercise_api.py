@@ -10,18 +10,32 @@ import cv2
 import numpy as np
 import io
 import json
+import logging
 import asyncio
+import time
 from typing import Optional
 import base64
 from PIL import Image
 
-from .exercise_analyzer import ExerciseAnalyzer, Exercise, PostureFeedback
+from .exercise_analyzer import ExerciseAnalyzer, Exercise, PostureFeedback, to_mp_image, pose_result_landmarks
+from .pose_model_pool import LiveStreamDetector, DEFAULT_RUNNING_MODE, RUNNING_MODES
+from .overlay import (
+    build_overlay, SKELETON_EDGES, RESPONSE_MODES, DEFAULT_RESPONSE_MODE, ANNOTATED_JPEG_QUALITY, ANNOTATED_JPEG_EVERY
+)
+from .session_registry import SessionRegistry, SessionLimitReached
+from .frame_executor import (
+    frame_executor, decode_frame, encode_frame, SessionQueue, FRAME_INGEST_MODE, INGEST_MODES
+)
+from .metrics import (
+    stage_timer, observe_stage, exercise_label, frame_seconds, frames_total, dropped_frames, active_sessions,
+    detector_fallbacks,
+)
 
 
 router = APIRouter(prefix="/exercise", tags=["exercise"])
 
-# Global analyzer instance (you might want to manage this differently in production)
-analyzer = ExerciseAnalyzer()
+# One analyzer state per client; pose models come from pose_model_pool / video_pose_model_pool
+sessions = SessionRegistry(ExerciseAnalyzer)
 
 
 @router.websocket("/live-analysis")
@@ -29,86 +43,259 @@ async def websocket_live_analysis(websocket: WebSocket):
     """
     WebSocket endpoint for real-time exercise analysis.
     
+    Connect with an optional `?session_id=...` to resume a previous session
+    (rep count, exercise state) after a reconnect, and an optional
+    `?ingest=latest|ordered`. In "latest" mode (the default) a frame that is
+    still waiting when a newer one arrives is dropped; `dropped_frames` in each
+    feedback message counts them.
+    
+    `?running_mode=video|image|live_stream` picks how poses are detected:
+    "video" (default) tracks the pose from frame to frame with a detector kept
+    for the connection (falls back to "image" when all video detectors are in
+    use - the session message reports the mode actually used), "image" detects
+    every frame from scratch, and
+    "live_stream" hands frames to MediaPipe asynchronously and sends feedback
+    as results come back (MediaPipe may skip frames under load).
+    
+    By default (`?response=overlay`) feedback carries only overlay geometry
+    (landmarks, joints to highlight, text) and the client draws it on the frame
+    it already has; skeleton edges come once in the session message. An
+    annotated JPEG is sent when a frame message has `"annotated": true`, or on
+    every `?jpeg_every=N`-th frame with `?response=jpeg`, encoded at
+    `?jpeg_quality=` (default 80).
+    
+    Per-frame logs are sampled; `?debug=1` (or a `{"type": "debug", "enabled": true}`
+    message) logs every frame event of this session.
+    
+    Server sends first:
+    {
+        "type": "session",
+        "session_id": "...",
+        "resumed": false,
+        "running_mode": "video",
+        "response": "overlay",
+        "skeleton_edges": [[0, 1], ...]
+    }
+    
     Client sends:
     {
         "type": "frame",
         "exercise": "PUSHUP",
-        "data": "base64_encoded_image"
+        "data": "base64_encoded_image",
+        "annotated": false            # optional: ask for a JPEG of this frame
     }
     
     Server responds:
     {
         "type": "feedback",
         "feedback": { ... },
-        "annotated_frame": "base64_encoded_image"
+        "overlay": {"landmarks": [[x, y, visibility], ...], "highlight": [...], "status": "...", "text": "..."},
+        "annotated_frame": "base64_encoded_image",   # only when requested
+        "dropped_frames": 0
     }
     """
     await websocket.accept()
     
+    try:
+        session, resumed = sessions.open(websocket.query_params.get("session_id"))
+    except SessionLimitReached as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=1013)
+        return
+    
+    analyzer = session.state
+    analyzer.log.session_id = session.session_id
+    if websocket.query_params.get("debug") in ("1", "true"):
+        analyzer.log.set_debug(True)
+    running_mode = websocket.query_params.get("running_mode", DEFAULT_RUNNING_MODE)
+    if running_mode not in RUNNING_MODES:
+        running_mode = DEFAULT_RUNNING_MODE
+    
+    stream: Optional[LiveStreamDetector] = None
+    if running_mode == "live_stream":
+        try:
+            stream = LiveStreamDetector(asyncio.get_running_loop())
+        except Exception as e:
+            await websocket.send_json({"type": "error", "message": f"Could not start live stream detector: {str(e)}"})
+            await websocket.close(code=1011)
+            sessions.detach(session)
+            return
+    elif running_mode == "video":
+        # Lease the tracking detector now (never per frame); if the video pool is full, use IMAGE mode
+        error = None
+        try:
+            leased = await frame_executor.run_inference(analyzer.lease_detector)
+            reason = "exhausted"
+        except Exception as e:
+            leased, reason, error = False, "unavailable", str(e)
+        if not leased:
+            analyzer.log.event("detector_fallback", level=logging.WARNING, reason=reason, error=error,
+                               running_mode="image")
+            detector_fallbacks.inc(reason)
+            running_mode = "image"
+        analyzer.running_mode = running_mode
+    else:
+        analyzer.running_mode = running_mode
+    
+    response_mode = websocket.query_params.get("response", DEFAULT_RESPONSE_MODE)
+    if response_mode not in RESPONSE_MODES:
+        response_mode = DEFAULT_RESPONSE_MODE
+    try:
+        jpeg_quality = min(100, max(1, int(websocket.query_params.get("jpeg_quality", ANNOTATED_JPEG_QUALITY))))
+        jpeg_every = max(1, int(websocket.query_params.get("jpeg_every", ANNOTATED_JPEG_EVERY)))
+    except ValueError:
+        jpeg_quality, jpeg_every = ANNOTATED_JPEG_QUALITY, ANNOTATED_JPEG_EVERY
+    frames_seen = 0
+    
+    await websocket.send_json({
+        "type": "session",
+        "session_id": session.session_id,
+        "resumed": resumed,
+        "running_mode": running_mode,
+        "response": response_mode,
+        "skeleton_edges": SKELETON_EDGES
+    })
+    
+    def wants_jpeg(data) -> bool:
+        nonlocal frames_seen
+        frames_seen += 1
+        if data.get("annotated"):
+            return True
+        return response_mode == "jpeg" and (frames_seen - 1) % jpeg_every == 0
+    
+    def dropped_count() -> int:
+        return work.dropped + (stream.skipped if stream is not None else 0)
+    
+    async def send_feedback(feedback: Optional[PostureFeedback], overlay: dict, annotated_frame: Optional[np.ndarray],
+                            exercise: Exercise, received: float):
+        if feedback:
+            # Send feedback with overlay geometry
+            message = {
+                "type": "feedback",
+                "feedback": {
+                    "is_correct": feedback.is_correct,
+                    "messages": feedback.feedback_messages,
+                    "angles": feedback.angle_data,
+                    "confidence": feedback.confidence
+                },
+                "overlay": overlay,
+                "dropped_frames": dropped_count()
+            }
+        else:
+            message = {
+                "type": "feedback",
+                "feedback": None,
+                "message": "No pose detected",
+                "overlay": overlay,
+                "dropped_frames": dropped_count()
+            }
+        
+        if annotated_frame is not None:
+            # Encode annotated frame to base64 (only when asked for)
+            with stage_timer("encode", exercise):
+                message["annotated_frame"] = await frame_executor.run_codec(encode_frame, annotated_frame, jpeg_quality)
+        with stage_timer("send", exercise):
+            await websocket.send_json(message)
+        label = exercise_label(exercise)
+        frame_seconds.observe(time.perf_counter() - received, "live", label)
+        frames_total.inc("live", label)
+    
+    async def process_frame(data):
+        try:
+            # Get exercise type
+            try:
+                exercise_enum = Exercise[data["exercise"].upper()]
+            except KeyError:
+                await websocket.send_json({
+                    "type": "error",
+                    "message": f"Invalid exercise type: {data['exercise']}"
+                })
+                return
+            
+            # Decode base64 image
+            with stage_timer("decode", exercise_enum):
+                frame = await frame_executor.run_codec(decode_frame, data["data"])
+            
+            # Switching exercises starts a fresh count for this session
+            if session.exercise is not None and session.exercise != exercise_enum:
+                analyzer.reset_exercise_state()
+            if session.exercise != exercise_enum:
+                analyzer.set_exercise(exercise_enum)
+            session.exercise = exercise_enum
+            session.touch()
+            
+            draw = wants_jpeg(data)
+            if stream is not None:
+                # Feedback is sent by consume_live_results once MediaPipe calls back
+                await frame_executor.run_inference(submit_live_frame, stream, frame, exercise_enum, draw, data["received"])
+                return
+            
+            # Analyze frame (and draw landmarks if a JPEG was asked for)
+            feedback, overlay, annotated_frame = await frame_executor.run_inference(
+                analyze_and_draw, analyzer, frame, exercise_enum, draw
+            )
+            await send_feedback(feedback, overlay, annotated_frame, exercise_enum, data["received"])
+        except Exception as frame_error:
+            analyzer.log.error("frame_error", error=str(frame_error))
+            await websocket.send_json({
+                "type": "error",
+                "message": f"Error processing frame: {str(frame_error)}"
+            })
+    
+    async def consume_live_results():
+        # LIVE_STREAM results arrive in timestamp order; analysis stays serialized per session
+        while True:
+            timestamp_ms, result = await stream.results.get()
+            skipped = stream.skipped
+            payload = stream.pop_payload(timestamp_ms)
+            if stream.skipped > skipped:
+                dropped_frames.inc("live", "skipped", amount=stream.skipped - skipped)
+            if payload is None:
+                continue
+            frame, exercise_enum, draw, received = payload
+            try:
+                feedback, overlay, annotated_frame = await frame_executor.run_inference(
+                    analyze_result_and_draw, analyzer, result, frame, exercise_enum, timestamp_ms, draw
+                )
+                await send_feedback(feedback, overlay, annotated_frame, exercise_enum, received)
+            except WebSocketDisconnect:
+                return
+            except Exception as result_error:
+                analyzer.log.error("live_stream_result_error", error=str(result_error))
+    
+    async def handle_message(data):
+        if data["type"] == "frame":
+            await process_frame(data)
+        elif data["type"] == "reset":
+            analyzer.reset_exercise_state()
+            session.touch()
+            await websocket.send_json({
+                "type": "reset",
+                "message": "Exercise state reset"
+            })
+        elif data["type"] == "debug":
+            analyzer.log.set_debug(data.get("enabled", True))
+            await websocket.send_json({"type": "debug", "enabled": analyzer.log.debug})
+    
+    # Messages are handled in order by one worker; stale frames are dropped in "latest" mode
+    ingest_mode = websocket.query_params.get("ingest", FRAME_INGEST_MODE)
+    if ingest_mode not in INGEST_MODES:
+        ingest_mode = FRAME_INGEST_MODE
+    work = SessionQueue(
+        handle_message,
+        mode=ingest_mode,
+        coalesce=lambda data: data.get("type") == "frame",
+        on_drop=lambda: dropped_frames.inc("live", "latest")
+    ).start()
+    results_task = asyncio.create_task(consume_live_results()) if stream is not None else None
+    active_sessions.inc("live")
+    
     try:
         while True:
             # Receive frame data
             data = await websocket.receive_json()
-            
-            if data["type"] == "frame":
-                try:
-                    # Decode base64 image
-                    image_data = base64.b64decode(data["data"])
-                    nparr = np.frombuffer(image_data, np.uint8)
-                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    
-                    # Get exercise type
-                    try:
-                        exercise_enum = Exercise[data["exercise"].upper()]
-                    except KeyError:
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": f"Invalid exercise type: {data['exercise']}"
-                        })
-                        continue
-                    
-                    # Analyze frame
-                    feedback = analyzer.analyze_exercise(frame, exercise_enum)
-                    
-                    # Draw landmarks on frame
-                    annotated_frame = analyzer.draw_landmarks(frame, include_feedback=True, feedback=feedback)
-                    
-                    # Encode annotated frame to base64
-                    _, buffer = cv2.imencode('.jpg', annotated_frame)
-                    annotated_base64 = base64.b64encode(buffer).decode('utf-8')
-                    
-                    if feedback:
-                        # Send feedback with annotated frame
-                        await websocket.send_json({
-                            "type": "feedback",
-                            "feedback": {
-                                "is_correct": feedback.is_correct,
-                                "messages": feedback.feedback_messages,
-                                "angles": feedback.angle_data,
-                                "confidence": feedback.confidence
-                            },
-                            "annotated_frame": annotated_base64
-                        })
-                    else:
-                        await websocket.send_json({
-                            "type": "feedback",
-                            "feedback": None,
-                            "message": "No pose detected",
-                            "annotated_frame": annotated_base64
-                        })
-                except Exception as frame_error:
-                    print(f"Error processing frame: {frame_error}")
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": f"Error processing frame: {str(frame_error)}"
-                    })
-                    
-            elif data["type"] == "reset":
-                analyzer.reset_exercise_state()
-                await websocket.send_json({
-                    "type": "reset",
-                    "message": "Exercise state reset"
-                })
+            data["received"] = time.perf_counter()
+            await work.submit(data)
                 
     except WebSocketDisconnect:
         print("WebSocket client disconnected")
@@ -121,6 +308,44 @@ async def websocket_live_analysis(websocket: WebSocket):
             })
         except:
             pass
+    finally:
+        await work.close()
+        if results_task is not None:
+            results_task.cancel()
+        if stream is not None:
+            await frame_executor.run_inference(stream.close)
+        # Hand the tracking detector back; a resumed session leases a fresh one
+        await frame_executor.run_inference(analyzer.release_detector)
+        sessions.detach(session)
+        active_sessions.dec("live")
+
+
+def analyze_and_draw(analyzer: ExerciseAnalyzer, frame: np.ndarray, exercise: Exercise, draw: bool = True):
+    """Inference + analysis (+ drawing) for one frame. Runs on the frame executor's threads."""
+    feedback = analyzer.analyze_exercise(frame, exercise)
+    return overlay_and_draw(analyzer, frame, feedback, draw, exercise)
+
+
+def submit_live_frame(stream: LiveStreamDetector, frame: np.ndarray, exercise: Exercise, draw: bool, received: float):
+    """Hand a frame to a LIVE_STREAM detector; the frame comes back with its result."""
+    stream.detect_async(to_mp_image(frame), payload=(frame, exercise, draw, received))
+
+
+def analyze_result_and_draw(analyzer: ExerciseAnalyzer, result, frame: np.ndarray, exercise: Exercise,
+                            timestamp_ms: int, draw: bool = True):
+    """Analysis (+ drawing) for a LIVE_STREAM result. Runs on the frame executor's threads."""
+    feedback = analyzer.analyze_detected(pose_result_landmarks(result), exercise, timestamp_ms / 1000)
+    return overlay_and_draw(analyzer, frame, feedback, draw, exercise)
+
+
+def overlay_and_draw(analyzer: ExerciseAnalyzer, frame: np.ndarray, feedback: Optional[PostureFeedback], draw: bool,
+                     exercise: Optional[Exercise] = None):
+    """Overlay geometry for the client, plus an annotated frame only when one will be sent."""
+    started = time.perf_counter()
+    overlay = build_overlay(analyzer.last_landmarks, feedback, analyzer.rep_count)
+    annotated_frame = analyzer.draw_landmarks(frame, include_feedback=True, feedback=feedback) if draw else None
+    observe_stage("annotate", exercise, time.perf_counter() - started)
+    return feedback, overlay, annotated_frame
 
 
 @router.get("/exercises")
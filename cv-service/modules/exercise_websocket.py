@@ -9,9 +9,17 @@ import numpy as np
 import cv2
 import logging
 import time
+import uuid
 
 # 실제 ExerciseAnalyzer 임포트
-from .exercise_analyzer import ExerciseAnalyzer, Exercise, PostureFeedback
+from .exercise_analyzer import ExerciseAnalyzer, Exercise, PostureFeedback, rulebook
+from .pose_model_pool import pose_model_pool, video_pose_model_pool
+from .frame_executor import frame_executor, SessionQueue, INGEST_MODES
+from .landmark_codec import decode_landmark_frame, LandmarkPacketError, LANDMARK_FORMATS
+from .kinematics import capture_seconds
+from .landmark_smoothing import SMOOTHING_MODES
+from .hot_path_logging import SessionLog
+from .metrics import observe_stage, exercise_label, frame_seconds, frames_total, dropped_frames, active_sessions
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
@@ -22,13 +30,16 @@ router = APIRouter(prefix="/api/workout", tags=["websocket"])
 class WebSocketExerciseAnalyzer:
     """WebSocket용 운동 분석기 - 실제 ExerciseAnalyzer 사용"""
     
-    def __init__(self):
+    def __init__(self, session_id: Optional[str] = None, debug: Optional[bool] = None):
         self.analyzer = ExerciseAnalyzer()
+        # 프레임마다 도는 경로의 로그는 샘플링 (디버그 세션은 전부 기록)
+        self.log = self.analyzer.log = SessionLog(session_id, debug)
         self.exercise_type = None
         self.target_reps = None
         self.target_time = None  # For time-based exercises
         self.is_time_based = False
         self.start_time = None
+        self.last_capture_time = None  # 클라이언트 캡처 시각(초) - 순서가 뒤바뀐 프레임을 걸러냄
         
         # FIXED: Add completion tracking to prevent duplicates
         self.completion_triggered = False
@@ -149,6 +160,8 @@ class WebSocketExerciseAnalyzer:
             
             # Reset exercise state
             self.analyzer.reset_exercise_state()
+            self.analyzer.set_exercise(self.exercise_type)
+            self.last_capture_time = None
             
             # FIXED: Reset completion tracking
             self.completion_triggered = False
@@ -162,19 +175,33 @@ class WebSocketExerciseAnalyzer:
             logger.info(f"지원 가능한 운동: {list(self.exercise_mapping.keys())}")
             return False
 
-    def analyze_landmarks(self, landmarks: List[Dict]) -> Optional[Dict]:
-        """Direct landmark analysis with time tracking and completion prevention"""
+    def analyze_landmarks(self, landmarks: List[Dict], timestamp_ms: Optional[float] = None) -> Optional[Dict]:
+        """
+        Direct landmark analysis with time tracking and completion prevention
+        
+        `timestamp_ms` is the client's capture time; speed and tempo are measured against it.
+        Frames captured no later than the last analyzed one are dropped.
+        """
         if not self.exercise_type:
-            logger.warning("Exercise type not set")
+            self.log.event("exercise_not_set")
             return None
         
         if len(landmarks) < 33:
-            logger.warning(f"Insufficient landmarks: {len(landmarks)}/33")
+            self.log.event("insufficient_landmarks", count=len(landmarks))
             return None
         
+        capture_time = capture_seconds(timestamp_ms)
+        if capture_time is not None:
+            if self.last_capture_time is not None and capture_time <= self.last_capture_time:
+                self.log.event("stale_frame", timestamp=timestamp_ms)
+                dropped_frames.inc("analyze", "stale")
+                return None
+            self.last_capture_time = capture_time
+        
         try:
             # Use direct landmark analysis
-            feedback = self.analyzer.analyze_landmarks_directly(landmarks, self.exercise_type)
+            reps_before = self.analyzer.reps.total
+            feedback = self.analyzer.analyze_landmarks_directly(landmarks, self.exercise_type, capture_time)
             
             if feedback:
                 result = {
@@ -185,6 +212,10 @@ class WebSocketExerciseAnalyzer:
                     "repQuality": getattr(feedback, 'rep_quality', 1.0)
                 }
                 
+                # 방금 완료된 반복의 품질/템포 (eccentric/concentric 초)
+                if self.analyzer.reps.total > reps_before:
+                    result["lastRep"] = self.analyzer.reps.records(self.analyzer.reps.total - 1)[-1]
+                
                 if self.is_time_based:
                     # For plank, track hold time
                     hold_time = feedback.angle_data.get('hold_time', 0)
@@ -206,7 +237,8 @@ class WebSocketExerciseAnalyzer:
                     else:
                         result["isComplete"] = False
                     
-                    logger.info(f"Plank analysis: hold_time={hold_time}, target={self.target_time}, complete={result['isComplete']}, triggered={self.completion_triggered}")
+                    self.log.event("plank_analysis", hold_time=hold_time, target=self.target_time,
+                                   complete=result["isComplete"], triggered=self.completion_triggered)
                 else:
                     # For rep-based exercises
                     result["repCount"] = self.analyzer.rep_count
@@ -227,16 +259,16 @@ class WebSocketExerciseAnalyzer:
                     else:
                         result["isComplete"] = False
                     
-                    logger.info(f"Rep analysis: reps={self.analyzer.rep_count}, target={self.target_reps}, complete={result['isComplete']}, triggered={self.completion_triggered}")
+                    self.log.event("rep_analysis", reps=self.analyzer.rep_count, target=self.target_reps,
+                                   complete=result["isComplete"], triggered=self.completion_triggered)
                 
                 return result
             else:
-                logger.warning("No analysis result")
+                self.log.event("no_analysis_result")
                 return None
                 
         except Exception as e:
-            logger.error(f"Analysis error: {str(e)}")
-            logger.error(traceback.format_exc())
+            self.log.error("analysis_error", error=str(e), traceback=traceback.format_exc())
             return None
 
     def reset(self):
@@ -244,6 +276,7 @@ class WebSocketExerciseAnalyzer:
         logger.info("운동 상태 리셋")
         self.analyzer.reset_exercise_state()
         self.start_time = None
+        self.last_capture_time = None
         
         # FIXED: Reset completion tracking
         self.completion_triggered = False
@@ -263,103 +296,211 @@ class WebSocketExerciseAnalyzer:
 
 @router.websocket("/ws/analyze")
 async def websocket_analyze(websocket: WebSocket):
-    """WebSocket endpoint for real-time posture analysis"""
+    """
+    WebSocket endpoint for real-time posture analysis
+    
+    Query: ?session_id=<id> (로그 식별용, 기본값 임의 생성), ?debug=1 (이 세션의 프레임 로그를 샘플링 없이 전부 기록)
+    디버그 모드는 init 메시지의 `"debug": true` 또는 `{"type": "debug", "enabled": true}` 메시지로도 켜고 끌 수 있음
+    
+    랜드마크는 JSON(`{"type": "landmarks", "landmarks": [...]}`) 또는 init 메시지에서
+    `"landmarkFormat": "binary"`로 협상한 경우 바이너리 프레임(landmark_codec.py 참고)으로 보낼 수 있음
+    (바이너리 프레임은 init_success 응답을 받은 뒤부터 보낼 것)
+    
+    랜드마크에는 캡처 시각(ms, JSON의 `"timestamp"` 또는 v2 패킷 헤더)을 함께 보내야 속도/템포가
+    실제 시간 기준으로 계산됨 - 없으면 서버 수신 시각을 사용
+    """
     await websocket.accept()
     logger.info("WebSocket 연결 성공")
     
-    analyzer = WebSocketExerciseAnalyzer()
+    session_id = websocket.query_params.get("session_id") or uuid.uuid4().hex[:8]
+    debug = websocket.query_params.get("debug") in ("1", "true") or None
+    analyzer = WebSocketExerciseAnalyzer(session_id, debug)
+    landmark_format = "json"
     
-    try:
-        while True:
-            # 클라이언트로부터 데이터 수신
-            data = await websocket.receive_json()
-            logger.info(f"수신된 데이터 타입: {data.get('type')}")
+    async def handle_message(data):
+        nonlocal landmark_format
+        if data['type'] == 'init':
+            # 운동 초기화
+            exercise_name = data.get('exercise')
+            target_reps = data.get('targetReps', 10)
+            target_time = data.get('targetTime')  # For time-based exercises
             
-            if data['type'] == 'init':
-                # 운동 초기화
-                exercise_name = data.get('exercise')
-                target_reps = data.get('targetReps', 10)
-                target_time = data.get('targetTime')  # For time-based exercises
-                
-                logger.info(f"운동 초기화: {exercise_name}, 목표 횟수: {target_reps}, 목표 시간: {target_time}")
-                
-                success = analyzer.set_exercise(exercise_name, target_reps, target_time)
-                
-                if success:
-                    # 카메라 설정 가이드도 함께 전송
-                    camera_guide = analyzer.get_camera_setup_guide(exercise_name)
-                    pose_guide = analyzer.get_pose_setup_guide(exercise_name)
-                    
+            # 수신 모드: latest(밀린 랜드마크는 버리고 최신 것만 분석) / ordered(모두 순서대로 분석)
+            ingest_mode = data.get('ingest')
+            if ingest_mode:
+                if ingest_mode not in INGEST_MODES:
                     await websocket.send_json({
-                        "type": "init_success",
-                        "message": f"✅ {exercise_name} 분석 준비 완료",
-                        "status": "ready", 
-                        "exercise": exercise_name,
-                        "exerciseType": analyzer.exercise_type.value if analyzer.exercise_type else exercise_name,
-                        "targetReps": analyzer.target_reps,
-                        "targetTime": analyzer.target_time,
-                        "isTimeBased": analyzer.is_time_based,
-                        "cameraGuide": camera_guide,
-                        "poseGuide": pose_guide
+                        "type": "error",
+                        "message": f"지원하지 않는 수신 모드: {ingest_mode}",
+                        "supportedIngestModes": list(INGEST_MODES)
                     })
-                    logger.info(f"초기화 성공 응답 전송: {exercise_name} -> {analyzer.exercise_type}")
-                else:
+                    return
+                work.mode = ingest_mode
+            
+            requested_format = data.get('landmarkFormat')
+            if requested_format and requested_format not in LANDMARK_FORMATS:
+                await websocket.send_json({
+                    "type": "error",
+                    "message": f"지원하지 않는 랜드마크 형식: {requested_format}",
+                    "supportedLandmarkFormats": list(LANDMARK_FORMATS)
+                })
+                return
+            
+            # 랜드마크 스무딩: ema(기본) / one_euro(빠른 동작에서 지연이 적음) / none
+            smoothing = data.get('smoothing')
+            if smoothing:
+                if smoothing not in SMOOTHING_MODES:
                     await websocket.send_json({
                         "type": "error",
-                        "message": f"지원하지 않는 운동: {exercise_name}",
-                        "supportedExercises": list(analyzer.exercise_mapping.keys())
+                        "message": f"지원하지 않는 스무딩 모드: {smoothing}",
+                        "supportedSmoothingModes": list(SMOOTHING_MODES)
                     })
-                    logger.error(f"초기화 실패 응답 전송")
-                
-            elif data['type'] == 'landmarks':
-                # 랜드마크 분석
-                if not analyzer.exercise_type:
-                    logger.warning("운동 타입 미설정 상태에서 랜드마크 수신")
-                    continue
-                
-                landmarks = data['landmarks']
-                
-                # 분석 수행
-                feedback = analyzer.analyze_landmarks(landmarks)
+                    return
+                analyzer.analyzer.set_smoothing(smoothing)
+            
+            if 'debug' in data:
+                analyzer.log.set_debug(data['debug'])
+            
+            logger.info(f"운동 초기화: {exercise_name}, 목표 횟수: {target_reps}, 목표 시간: {target_time}")
+            
+            success = analyzer.set_exercise(exercise_name, target_reps, target_time)
+            
+            if success:
+                # 형식 협상은 초기화가 성공한 뒤에만 반영 - 앞서 대기 중인 프레임은 이전 형식으로 처리됨
+                if requested_format:
+                    landmark_format = requested_format
                 
-                if feedback:
-                    # 피드백 전송
-                    response = {
-                        "type": "feedback",
-                        "feedback": feedback,
-                        "repCount": feedback.get("repCount", 0),
-                        "holdTime": feedback.get("holdTime", 0),
-                        "isComplete": feedback.get("isComplete", False)
-                    }
-                    
-                    await websocket.send_json(response)
-                    
-                    # FIXED: Log completion status only once
-                    if feedback.get("isComplete") and not analyzer.completion_api_called:
-                        if analyzer.is_time_based:
-                            logger.info(f"시간 기반 운동 완료: {feedback.get('holdTime')}초")
-                        else:
-                            logger.info(f"횟수 기반 운동 완료: {feedback.get('repCount')}회")
-                        analyzer.mark_completion_api_called()
-                    
-                else:
-                    logger.warning("분석 결과 없음")
+                # 카메라 설정 가이드도 함께 전송
+                camera_guide = analyzer.get_camera_setup_guide(exercise_name)
+                pose_guide = analyzer.get_pose_setup_guide(exercise_name)
                 
-            elif data['type'] == 'reset':
-                # 리셋
-                logger.info("리셋 요청 수신")
-                result = analyzer.reset()
                 await websocket.send_json({
-                    "type": "status",
-                    "message": "리셋 완료",
-                    **result
+                    "type": "init_success",
+                    "message": f"✅ {exercise_name} 분석 준비 완료",
+                    "status": "ready", 
+                    "exercise": exercise_name,
+                    "exerciseType": analyzer.exercise_type.value if analyzer.exercise_type else exercise_name,
+                    "targetReps": analyzer.target_reps,
+                    "targetTime": analyzer.target_time,
+                    "isTimeBased": analyzer.is_time_based,
+                    "ingest": work.mode,
+                    "landmarkFormat": landmark_format,
+                    "smoothing": analyzer.analyzer.smoother.mode,
+                    "sessionId": session_id,
+                    "debug": analyzer.log.debug,
+                    "cameraGuide": camera_guide,
+                    "poseGuide": pose_guide
+                })
+                logger.info(f"초기화 성공 응답 전송: {exercise_name} -> {analyzer.exercise_type}")
+            else:
+                await websocket.send_json({
+                    "type": "error",
+                    "message": f"지원하지 않는 운동: {exercise_name}",
+                    "supportedExercises": list(analyzer.exercise_mapping.keys())
                 })
-                logger.info("리셋 완료 응답 전송")
+                logger.error(f"초기화 실패 응답 전송")
+            
+        elif data['type'] == 'landmarks':
+            # 랜드마크 분석
+            if not analyzer.exercise_type:
+                analyzer.log.event("landmarks_before_init")
+                return
+            
+            landmarks = data['landmarks']
+            exercise = analyzer.exercise_type
+            
+            # 분석 수행 - 스레드 풀에서 실행하여 그동안 수신 루프가 밀린 메시지를 정리할 수 있게 함
+            feedback = await frame_executor.run_inference(analyzer.analyze_landmarks, landmarks, data.get('timestamp'))
+            
+            if feedback:
+                # 피드백 전송
+                response = {
+                    "type": "feedback",
+                    "feedback": feedback,
+                    "repCount": feedback.get("repCount", 0),
+                    "holdTime": feedback.get("holdTime", 0),
+                    "isComplete": feedback.get("isComplete", False),
+                    "droppedFrames": work.dropped
+                }
+                
+                sending = time.perf_counter()
+                await websocket.send_json(response)
+                sent = time.perf_counter()
+                label = exercise_label(exercise)
+                observe_stage("send", exercise, sent - sending)
+                frame_seconds.observe(sent - data["received"], "analyze", label)
+                frames_total.inc("analyze", label)
+                
+                # FIXED: Log completion status only once
+                if feedback.get("isComplete") and not analyzer.completion_api_called:
+                    if analyzer.is_time_based:
+                        logger.info(f"시간 기반 운동 완료: {feedback.get('holdTime')}초")
+                    else:
+                        logger.info(f"횟수 기반 운동 완료: {feedback.get('repCount')}회")
+                    analyzer.mark_completion_api_called()
                 
-            elif data['type'] == 'completion_api_called':
-                # FIXED: Mark that frontend has called the completion API
-                analyzer.mark_completion_api_called()
-                logger.info("Frontend reported completion API called")
+            else:
+                analyzer.log.event("no_feedback")
+            
+        elif data['type'] == 'reset':
+            # 리셋
+            logger.info("리셋 요청 수신")
+            result = analyzer.reset()
+            await websocket.send_json({
+                "type": "status",
+                "message": "리셋 완료",
+                **result
+            })
+            logger.info("리셋 완료 응답 전송")
+            
+        elif data['type'] == 'completion_api_called':
+            # FIXED: Mark that frontend has called the completion API
+            analyzer.mark_completion_api_called()
+            logger.info("Frontend reported completion API called")
+            
+        elif data['type'] == 'debug':
+            # 세션별 디버그 로그 토글
+            analyzer.log.set_debug(data.get('enabled', True))
+            logger.info(f"세션 {session_id} 디버그 로그: {analyzer.log.debug}")
+            await websocket.send_json({"type": "status", "message": "debug", "debug": analyzer.log.debug})
+    
+    # 수신과 분석을 분리: 분석이 밀리면 대기 중인 랜드마크는 최신 것으로 교체됨
+    work = SessionQueue(
+        handle_message,
+        coalesce=lambda data: data.get('type') == 'landmarks',
+        on_drop=lambda: dropped_frames.inc("analyze", "latest")
+    ).start()
+    active_sessions.inc("analyze")
+    
+    try:
+        while True:
+            # 클라이언트로부터 데이터 수신 (텍스트: JSON, 바이너리: 랜드마크 패킷)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            received = time.perf_counter()
+            
+            if message.get("bytes") is not None:
+                if landmark_format != "binary":
+                    await websocket.send_json({
+                        "type": "error",
+                        "message": "바이너리 랜드마크는 init 메시지에서 landmarkFormat: binary 로 협상한 뒤 사용하세요"
+                    })
+                    continue
+                try:
+                    landmarks, timestamp = decode_landmark_frame(message["bytes"])
+                except LandmarkPacketError as e:
+                    await websocket.send_json({"type": "error", "message": f"잘못된 랜드마크 패킷: {e}"})
+                    continue
+                data = {"type": "landmarks", "landmarks": landmarks, "timestamp": timestamp}
+            else:
+                data = json.loads(message["text"])
+            
+            if data.get('type') == 'landmarks':
+                observe_stage("decode", analyzer.exercise_type, time.perf_counter() - received)
+                data["received"] = received
+            analyzer.log.event("message_received", type=data.get('type'))
+            await work.submit(data)
                 
     except WebSocketDisconnect:
         logger.info("클라이언트 연결 해제")
@@ -374,11 +515,13 @@ async def websocket_analyze(websocket: WebSocket):
         except:
             pass
     finally:
+        await work.close()
+        active_sessions.dec("analyze")
         try:
             await websocket.close()
         except:
             pass
-        logger.info("WebSocket 연결 정리 완료")
+        logger.info(f"WebSocket 연결 정리 완료 (버려진 프레임: {work.dropped})")
 
 
 @router.get("/ws/health")
@@ -388,6 +531,8 @@ async def websocket_health():
         "status": "healthy",
         "endpoint": "/api/workout/ws/analyze",
         "protocol": "ws",
+        "landmark_formats": list(LANDMARK_FORMATS),
+        "smoothing_modes": list(SMOOTHING_MODES),
         "supported_exercises": [
             "푸시업", "스쿼트", "레그레이즈", "덤벨컬", "원암덤벨로우", "플랭크"
         ],
@@ -398,10 +543,14 @@ async def websocket_health():
 @router.get("/ws/debug")
 async def websocket_debug():
     """디버깅용 엔드포인트"""
-    analyzer = ExerciseAnalyzer()
+    pool_stats = pose_model_pool.stats()
+    video_pool_stats = video_pose_model_pool.stats()
     return {
         "analyzer_available": True,
         "exercises": [e.value for e in Exercise],
-        "model_loaded": hasattr(analyzer, 'detector'),
+        "model_loaded": pool_stats["created"] + video_pool_stats["created"] > 0,
+        "pose_model_pool": pool_stats,
+        "video_pose_model_pool": video_pool_stats,
+        "exercise_specs": rulebook.stats(),
         "time_based_exercises": ["플랭크", "워밍업: 러닝머신", "마무리: 러닝머신", "러닝머신"]
     }
\ No newline at end of file
@@ -0,0 +1,179 @@
+# cv-service/modules/frame_executor.py
+
+# What it does: Runs the heavy per-frame work (JPEG decode/encode, pose inference, drawing) off the event loop
+# Think of it as: A kitchen behind the counter - the waiter (asyncio) takes orders, cooks do the work
+# OpenCV and MediaPipe release the GIL, so a thread pool gives real parallelism across sessions
+
+import asyncio
+import base64
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+import cv2
+import numpy as np
+
+
+FRAME_EXECUTOR_KIND = os.getenv("FRAME_EXECUTOR", "thread")  # "thread" or "process" (codec stages only)
+FRAME_EXECUTOR_WORKERS = int(os.getenv("FRAME_EXECUTOR_WORKERS", str(min(8, (os.cpu_count() or 1) + 2))))
+FRAME_MAX_IN_FLIGHT = int(os.getenv("FRAME_MAX_IN_FLIGHT", "2"))  # queued frames per session
+FRAME_INGEST_MODE = os.getenv("FRAME_INGEST_MODE", "latest")  # "latest" (drop stale frames) or "ordered"
+
+INGEST_MODES = ("latest", "ordered")
+
+
+def decode_frame(image_base64: str) -> Optional[np.ndarray]:
+    """Decode a base64 JPEG/PNG string into a BGR frame."""
+    image_data = base64.b64decode(image_base64)
+    nparr = np.frombuffer(image_data, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def encode_frame(frame: np.ndarray, quality: int = 95) -> str:
+    """Encode a BGR frame as a base64 JPEG string."""
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return base64.b64encode(buffer).decode('utf-8')
+
+
+class FrameExecutor:
+    """
+    Executor stage shared by all frame-based WebSocket sessions.
+
+    Stateful work (inference + analysis, which touches the session's analyzer)
+    always runs on the thread pool. Stateless codec work (decode/encode) runs on
+    a process pool when FRAME_EXECUTOR=process, otherwise on the same threads.
+    """
+
+    def __init__(self, kind: str = FRAME_EXECUTOR_KIND, workers: int = FRAME_EXECUTOR_WORKERS):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown frame executor kind: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="frame")
+        return self._threads
+
+    def _codec_pool(self) -> Executor:
+        if self.kind == "process":
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.workers)
+            return self._processes
+        return self._thread_pool()
+
+    async def run_codec(self, fn: Callable, *args) -> Any:
+        """Run a stateless, picklable function (decode_frame / encode_frame)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._codec_pool(), fn, *args)
+
+    async def run_inference(self, fn: Callable, *args) -> Any:
+        """Run stateful work (pose detection, analysis, drawing) on the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._thread_pool(), fn, *args)
+
+    def shutdown(self):
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+
+class SessionQueue:
+    """
+    Bounded per-session work queue drained in order by a single background task.
+
+    Two ingest modes:
+      - "ordered": every message is handled; `submit` waits while `max_in_flight`
+        items are already queued, so a fast client is slowed down instead of
+        growing memory.
+      - "latest": data messages (those for which `coalesce(item)` is true, e.g.
+        frames or landmark packets) replace a still-queued older data message
+        instead of waiting behind it, so only the newest one is analyzed.
+        Control messages (init/reset/...) are never dropped and keep their order.
+    `dropped` counts data messages that were replaced before being handled
+    (`on_drop`, if given, is called for each one - e.g. to feed a metrics counter).
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], max_in_flight: int = FRAME_MAX_IN_FLIGHT,
+                 mode: str = FRAME_INGEST_MODE, coalesce: Callable[[Any], bool] = lambda item: False,
+                 on_drop: Optional[Callable[[], None]] = None):
+        self.handler = handler
+        self.max_in_flight = max(1, max_in_flight)
+        self.mode = mode
+        self.coalesce = coalesce
+        self.dropped = 0
+        self.on_drop = on_drop
+        self._items: deque = deque()
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @mode.setter
+    def mode(self, value: str):
+        if value not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest mode: {value}")
+        self._mode = value
+
+    def start(self):
+        self._task = asyncio.create_task(self._drain())
+        return self
+
+    async def submit(self, item: Any):
+        if self._error is not None:
+            # Surface the handler's failure (e.g. client gone) to the receive loop
+            raise self._error
+
+        async with self._changed:
+            if self._mode == "latest" and self.coalesce(item):
+                if self._items and self.coalesce(self._items[-1]):
+                    # Latest frame wins - the queued one is now stale
+                    self._items[-1] = item
+                    self.dropped += 1
+                    if self.on_drop is not None:
+                        self.on_drop()
+                    return
+            else:
+                while len(self._items) >= self.max_in_flight and self._error is None:
+                    await self._changed.wait()
+            self._items.append(item)
+            self._changed.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+    async def _drain(self):
+        while True:
+            async with self._changed:
+                while not self._items:
+                    await self._changed.wait()
+                item = self._items.popleft()
+                self._changed.notify_all()
+            try:
+                if self._error is None:
+                    await self.handler(item)
+            except Exception as e:
+                # Keep draining so a blocked submit() wakes up and sees the error
+                self._error = e
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+# Shared executor for the whole process
+frame_executor = FrameExecutor()
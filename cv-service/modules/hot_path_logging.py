@@ -0,0 +1,114 @@
+# cv-service/modules/hot_path_logging.py
+
+# What it does: Cheap, sampled, structured logging for code that runs on every frame
+# Think of it as: A trainer's notebook - one line every few seconds per athlete, unless you ask them to write everything down
+# Records go through a queue; a background thread formats and writes them, so frame threads never wait on stdout
+#
+# - Each event name is logged at most once per HOT_PATH_LOG_INTERVAL seconds per session; the next record
+#   carries "suppressed": <how many were skipped>
+# - A session in debug mode (ws message / ?debug=1 / DEBUG_SESSIONS) logs every event, including debug steps
+# - Records are JSON lines: {"ts", "level", "event", "session", ...fields}
+
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+
+HOT_PATH_LOG_INTERVAL = float(os.getenv("HOT_PATH_LOG_INTERVAL", "10"))
+HOT_PATH_LOG_LEVEL = os.getenv("HOT_PATH_LOG_LEVEL", "INFO").upper()
+DEBUG_SESSIONS = {s for s in os.getenv("DEBUG_SESSIONS", "").split(",") if s}
+
+hot_path_logger = logging.getLogger("cv.hotpath")
+hot_path_logger.setLevel(HOT_PATH_LOG_LEVEL)
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", {}))
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def start_log_listener(stream=None):
+    """Send hot-path records through a queue to a background writer thread (safe to call twice)."""
+    global _listener
+    if _listener is not None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    hot_path_logger.addHandler(QueueHandler(records))
+    hot_path_logger.propagate = False
+    _listener = QueueListener(records, handler)
+    _listener.start()
+
+
+def stop_log_listener():
+    """Flush pending records and stop the writer thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    for handler in [h for h in hot_path_logger.handlers if isinstance(h, QueueHandler)]:
+        hot_path_logger.removeHandler(handler)
+    hot_path_logger.propagate = True
+
+
+class SessionLog:
+    """Hot-path logger for one session: sampled per event name, or everything while `debug` is on."""
+
+    def __init__(self, session_id: Optional[str] = None, debug: Optional[bool] = None,
+                 interval: float = HOT_PATH_LOG_INTERVAL):
+        self.session_id = session_id
+        self.debug = (session_id in DEBUG_SESSIONS) if debug is None else debug
+        self.interval = interval
+        self._last_emit: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+
+    def event(self, name: str, level: int = logging.INFO, **fields):
+        """Log an event - at most once per interval per name unless the session is in debug mode."""
+        if not self.debug:
+            if not hot_path_logger.isEnabledFor(level):
+                return
+            now = time.monotonic()
+            last = self._last_emit.get(name)
+            if last is not None and now - last < self.interval:
+                self._suppressed[name] = self._suppressed.get(name, 0) + 1
+                return
+            self._last_emit[name] = now
+            suppressed = self._suppressed.pop(name, 0)
+            if suppressed:
+                fields["suppressed"] = suppressed
+        self._emit(level, name, fields)
+
+    def error(self, name: str, **fields):
+        self.event(name, logging.ERROR, **fields)
+
+    def debug_event(self, name: str, **fields):
+        """Detailed step logging - only for sessions in debug mode."""
+        if self.debug:
+            self._emit(logging.DEBUG, name, fields)
+
+    def set_debug(self, enabled: bool):
+        self.debug = bool(enabled)
+
+    def _emit(self, level: int, name: str, fields: Dict):
+        fields["session"] = self.session_id
+        # handle() skips the logger's level check, so debug sessions get through a production level
+        record = hot_path_logger.makeRecord(hot_path_logger.name, level, __file__, 0, name, None, None,
+                                            extra={"fields": fields})
+        hot_path_logger.handle(record)
@@ -0,0 +1,97 @@
+# cv-service/modules/kinematics.py
+
+# What it does: Measures movement in real time units - angular velocity and per-rep tempo
+# Think of it as: The trainer's stopwatch - speed is judged in degrees per second, not per video frame
+# Works from capture timestamps, so results don't depend on the client's fps or on frames the server drops
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+
+MIN_FRAME_INTERVAL = 1e-3  # seconds; two frames closer than this are treated as this far apart
+TEMPO_TOP_FRACTION = 0.1  # a rep's first phase starts where the signal leaves the top 10% of its range
+
+
+def capture_seconds(timestamp_ms) -> Optional[float]:
+    """Client capture timestamp (ms, e.g. Date.now()) -> seconds, or None if missing/invalid."""
+    if isinstance(timestamp_ms, bool) or not isinstance(timestamp_ms, (int, float)):
+        return None
+    if not math.isfinite(timestamp_ms) or timestamp_ms < 0:
+        return None
+    return timestamp_ms / 1000.0
+
+
+def steady(last: Dict, key: str, value: float, time: float, max_rate: float) -> bool:
+    """
+    False when `value` moves faster than `max_rate` units per second since the last steady frame.
+
+    `last` maps key -> (value, time) and is updated only on steady frames, so a too-fast
+    frame is compared against the last trusted one. Dropped or coalesced frames widen the
+    time step instead of inflating the speed.
+    """
+    previous = last.get(key)
+    if previous is not None:
+        previous_value, previous_time = previous
+        elapsed = max(time - previous_time, MIN_FRAME_INTERVAL)
+        if abs(value - previous_value) / elapsed > max_rate:
+            return False
+    last[key] = (value, time)
+    return True
+
+
+def velocity(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Velocity (per second) of unevenly sampled values.
+
+    Repeated timestamps are dropped first; the returned array matches the remaining samples.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(times) > 1:
+        keep = np.concatenate([[True], np.diff(times) > 0])
+        times, values = times[keep], values[keep]
+    if len(times) < 2:
+        return np.zeros(len(times))
+    return np.gradient(values, times)
+
+
+@dataclass
+class RepTempo:
+    eccentric: float  # seconds
+    concentric: float  # seconds
+    peak_velocity: float  # largest |velocity| during the rep (signal units per second)
+
+
+def rep_tempo(times: np.ndarray, values: np.ndarray, end_time: float, turn: str = "min",
+              first: str = "eccentric") -> Optional[RepTempo]:
+    """
+    Split one rep of a movement signal into its two phases.
+
+    Args:
+        times, values: Samples of the rep's primary signal (e.g. elbow angle), oldest first
+        end_time: When the rep was counted (end of the second phase)
+        turn: "min" if the signal bottoms out mid-rep (pushup elbow angle), "max" if it peaks (leg elevation)
+        first: Phase before the turning point - "eccentric" (lowering) or "concentric" (lifting)
+
+    The first phase starts where the signal leaves the top TEMPO_TOP_FRACTION of the rep's
+    range, so idle time before the rep isn't counted.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(times) < 3:
+        return None
+    signal = values if turn == "min" else -values
+    k_turn = int(np.argmin(signal))
+    top = float(signal[:k_turn + 1].max())
+    threshold = top - TEMPO_TOP_FRACTION * (top - float(signal[k_turn]))
+    k_start = int(np.flatnonzero(signal[:k_turn + 1] >= threshold)[-1])
+    phase1 = float(times[k_turn] - times[k_start])
+    phase2 = max(0.0, float(end_time - times[k_turn]))
+    rates = velocity(times, values)
+    peak = float(np.abs(rates).max()) if len(rates) else 0.0
+    if first == "eccentric":
+        return RepTempo(eccentric=phase1, concentric=phase2, peak_velocity=peak)
+    return RepTempo(eccentric=phase2, concentric=phase1, peak_velocity=peak)
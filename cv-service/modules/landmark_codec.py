@@ -0,0 +1,88 @@
+# cv-service/modules/landmark_codec.py
+
+# What it does: Packs/unpacks pose landmarks in a compact binary WebSocket frame
+# Think of it as: Sending 33 points as a tight little parcel instead of a long JSON letter
+# Opt-in per connection (init message: "landmarkFormat": "binary"); JSON keeps working
+#
+# Packet layout (little-endian, 8-byte header + payload):
+#   offset 0  2s   magic b"LM"
+#   offset 2  u8   version (1, or 2 with a capture timestamp)
+#   offset 3  u8   flags (reserved, 0)
+#   offset 4  u16  landmark count N (33 for MediaPipe Pose)
+#   offset 6  u16  reserved (0) - keeps the payload 4-byte aligned
+#   v1: offset 8   f32[N][4]  x, y, z, visibility per landmark
+#   v2: offset 8   f64        capture timestamp, ms since the epoch (Date.now() / performance.timeOrigin + now())
+#       offset 16  f32[N][4]  x, y, z, visibility per landmark
+
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+LANDMARK_MAGIC = b"LM"
+LANDMARK_PACKET_VERSION = 2  # written by encode_landmark_packet when a timestamp is given; v1 is still accepted
+LANDMARK_FIELDS = 4  # x, y, z, visibility
+
+LANDMARK_FORMATS = ("json", "binary")
+
+_HEADER = struct.Struct("<2sBBHH")
+HEADER_SIZE = _HEADER.size
+_TIMESTAMP = struct.Struct("<d")
+_PAYLOAD_DTYPE = np.dtype("<f4")
+
+
+class LandmarkPacketError(ValueError):
+    """Raised for binary landmark packets that don't match the wire format."""
+
+
+def decode_landmark_frame(data: bytes) -> Tuple[np.ndarray, Optional[float]]:
+    """
+    Decode a binary landmark packet into an (N, 4) float32 array and its capture timestamp (ms).
+
+    The timestamp is None for v1 packets. The array is a zero-copy view over `data` (read-only).
+    """
+    if len(data) < HEADER_SIZE:
+        raise LandmarkPacketError(f"Packet too short: {len(data)} bytes")
+
+    magic, version, _flags, count, _reserved = _HEADER.unpack_from(data)
+    if magic != LANDMARK_MAGIC:
+        raise LandmarkPacketError(f"Bad magic: {magic!r}")
+    if version not in (1, 2):
+        raise LandmarkPacketError(f"Unsupported packet version: {version}")
+
+    offset = HEADER_SIZE if version == 1 else HEADER_SIZE + _TIMESTAMP.size
+    expected = offset + count * LANDMARK_FIELDS * _PAYLOAD_DTYPE.itemsize
+    if len(data) != expected:
+        raise LandmarkPacketError(f"Expected {expected} bytes for {count} landmarks, got {len(data)}")
+
+    timestamp_ms = _TIMESTAMP.unpack_from(data, HEADER_SIZE)[0] if version == 2 else None
+    landmarks = np.frombuffer(data, dtype=_PAYLOAD_DTYPE, count=count * LANDMARK_FIELDS,
+                              offset=offset).reshape(count, LANDMARK_FIELDS)
+    return landmarks, timestamp_ms
+
+
+def decode_landmark_packet(data: bytes) -> np.ndarray:
+    """Decode a binary landmark packet into an (N, 4) float32 array, ignoring any timestamp."""
+    return decode_landmark_frame(data)[0]
+
+
+def encode_landmark_packet(landmarks, timestamp_ms: Optional[float] = None) -> bytes:
+    """
+    Encode an (N, 4) array (or list of x/y/z/visibility dicts) as a binary packet.
+
+    With `timestamp_ms` the packet is v2 and carries the capture time; without it, v1.
+    """
+    if not isinstance(landmarks, np.ndarray):
+        landmarks = [
+            (lm.get('x', 0), lm.get('y', 0), lm.get('z', 0), lm.get('visibility', 1.0))
+            for lm in landmarks
+        ]
+    payload = np.ascontiguousarray(landmarks, dtype=_PAYLOAD_DTYPE)
+    if payload.ndim != 2 or payload.shape[1] != LANDMARK_FIELDS:
+        raise LandmarkPacketError(f"Expected (N, {LANDMARK_FIELDS}) landmarks, got {payload.shape}")
+
+    if timestamp_ms is None:
+        return _HEADER.pack(LANDMARK_MAGIC, 1, 0, payload.shape[0], 0) + payload.tobytes()
+    header = _HEADER.pack(LANDMARK_MAGIC, LANDMARK_PACKET_VERSION, 0, payload.shape[0], 0)
+    return header + _TIMESTAMP.pack(float(timestamp_ms)) + payload.tobytes()
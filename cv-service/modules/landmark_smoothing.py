@@ -0,0 +1,167 @@
+# cv-service/modules/landmark_smoothing.py
+
+# What it does: Removes frame-to-frame jitter from pose landmarks before they are analyzed
+# Think of it as: A steady hand on the camera - small shakes are ignored, real movement gets through
+# Works in place on one preallocated buffer per session, so smoothing costs no per-frame allocation
+
+import math
+import os
+import time
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+
+SMOOTHING_MODES = ("ema", "one_euro", "none")
+DEFAULT_SMOOTHING_MODE = os.getenv("LANDMARK_SMOOTHING", "ema")
+
+
+class LandmarkSmoother:
+    """
+    Per-session smoother for (N, 4) landmark arrays (x, y, z, visibility).
+
+    Modes:
+      - "ema": exponential moving average, `smoothed = alpha * previous + (1 - alpha) * current`.
+        `alpha` can be a scalar or one value per landmark (higher = smoother, more lag).
+      - "one_euro": One-Euro filter (Casiez et al. 2012). Strong smoothing while still,
+        little lag while moving fast. `min_cutoff` (Hz) may also be per landmark; `beta`
+        controls how quickly the cutoff rises with speed. Needs timestamps (seconds).
+      - "none": pass-through.
+
+    Visibility is never smoothed. `smooth` returns the internal buffer - it is
+    overwritten by the next call, so copy it if you need to keep it.
+    """
+
+    def __init__(self, mode: str = DEFAULT_SMOOTHING_MODE, alpha: Union[float, np.ndarray] = 0.7,
+                 min_cutoff: Union[float, np.ndarray] = 1.0, beta: float = 0.05, d_cutoff: float = 1.0,
+                 num_landmarks: int = 33):
+        if mode not in SMOOTHING_MODES:
+            raise ValueError(f"Unknown smoothing mode: {mode}")
+        self.mode = mode
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.num_landmarks = num_landmarks
+
+        self._alpha = self._per_landmark(alpha)
+        self._one_minus_alpha = 1 - self._alpha
+        self._min_cutoff = self._per_landmark(min_cutoff)
+
+        self._buffer = np.zeros((num_landmarks, 4))
+        self._velocity = np.zeros((num_landmarks, 3))  # One-Euro derivative estimate
+        self._scratch = np.zeros((num_landmarks, 3))
+        self._scratch2 = np.zeros((num_landmarks, 3))
+        self._last_timestamp: Optional[float] = None
+        self._primed = False
+
+    def _per_landmark(self, value) -> np.ndarray:
+        """Scalar or length-N values -> (N, 1) array that broadcasts over x/y/z."""
+        values = np.asarray(value, dtype=np.float64).reshape(-1, 1)
+        if values.shape[0] == 1:
+            values = np.repeat(values, self.num_landmarks, axis=0)
+        if values.shape[0] != self.num_landmarks:
+            raise ValueError(f"Expected 1 or {self.num_landmarks} values, got {values.shape[0]}")
+        return values
+
+    def set_alpha(self, alpha: Union[float, np.ndarray]):
+        """Change the EMA factor (scalar or per landmark)."""
+        self._alpha = self._per_landmark(alpha)
+        self._one_minus_alpha = 1 - self._alpha
+
+    def reset(self):
+        self._primed = False
+        self._last_timestamp = None
+        self._velocity.fill(0.0)
+
+    def smooth(self, landmarks: np.ndarray, timestamp: Optional[float] = None) -> np.ndarray:
+        """Smooth one frame of landmarks in place and return the smoothed buffer."""
+        if self.mode == "none":
+            return landmarks
+
+        if landmarks.shape != self._buffer.shape:
+            raise ValueError(f"Expected landmarks of shape {self._buffer.shape}, got {landmarks.shape}")
+
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        if not self._primed:
+            self._buffer[:] = landmarks
+            self._velocity.fill(0.0)
+            self._last_timestamp = timestamp
+            self._primed = True
+            return self._buffer
+
+        if self.mode == "ema":
+            self._ema(landmarks)
+        else:
+            self._one_euro(landmarks, timestamp)
+
+        self._buffer[:, 3] = landmarks[:, 3]
+        self._last_timestamp = timestamp
+        return self._buffer
+
+    def _ema(self, landmarks: np.ndarray):
+        xyz = self._buffer[:, :3]
+        xyz *= self._alpha
+        np.multiply(landmarks[:, :3], self._one_minus_alpha, out=self._scratch)
+        xyz += self._scratch
+
+    def _one_euro(self, landmarks: np.ndarray, timestamp: float):
+        xyz = self._buffer[:, :3]
+        raw = self._scratch
+        gain = self._scratch2
+
+        dt = max(timestamp - self._last_timestamp, 1e-3)
+        two_pi_dt = 2 * math.pi * dt
+
+        # Smoothed derivative of the signal
+        np.subtract(landmarks[:, :3], xyz, out=raw)
+        raw /= dt
+        d_gain = two_pi_dt * self.d_cutoff / (two_pi_dt * self.d_cutoff + 1)
+        self._velocity *= 1 - d_gain
+        raw *= d_gain
+        self._velocity += raw
+
+        # Cutoff rises with speed: fast motion -> less smoothing, less lag
+        np.abs(self._velocity, out=gain)
+        gain *= self.beta
+        gain += self._min_cutoff
+        gain *= two_pi_dt
+        np.add(gain, 1.0, out=raw)
+        gain /= raw
+
+        # x += gain * (current - x)
+        np.subtract(landmarks[:, :3], xyz, out=raw)
+        raw *= gain
+        xyz += raw
+
+
+def smooth_batch(smoothers: Sequence[LandmarkSmoother], landmarks: Sequence[np.ndarray],
+                 timestamps: Optional[Sequence[Optional[float]]] = None) -> np.ndarray:
+    """
+    Smooth one frame for each of B sessions and return the result as a new (B, N, 4) array.
+
+    Primed EMA smoothers are updated together in one vectorized pass (same result
+    as calling `smooth` on each); other modes fall back to their own `smooth`.
+    Every smoother's buffer is left exactly as a per-session call would leave it.
+    """
+    stacked = np.array(landmarks, dtype=np.float64)
+    now = time.monotonic()
+    stamps: List[float] = [now if ts is None else ts for ts in (timestamps or [None] * len(smoothers))]
+
+    ema_rows = [row for row, smoother in enumerate(smoothers) if smoother.mode == "ema" and smoother._primed]
+    if ema_rows:
+        previous = np.stack([smoothers[row]._buffer for row in ema_rows])
+        xyz = previous[..., :3]
+        xyz *= np.stack([smoothers[row]._alpha for row in ema_rows])
+        xyz += stacked[ema_rows, :, :3] * np.stack([smoothers[row]._one_minus_alpha for row in ema_rows])
+        previous[..., 3] = stacked[ema_rows, :, 3]
+        stacked[ema_rows] = previous
+        for smoothed, row in zip(previous, ema_rows):
+            smoothers[row]._buffer[:] = smoothed
+            smoothers[row]._last_timestamp = stamps[row]
+
+    ema_set = set(ema_rows)
+    for row, smoother in enumerate(smoothers):
+        if row not in ema_set:
+            stacked[row] = smoother.smooth(stacked[row], stamps[row])
+    return stacked
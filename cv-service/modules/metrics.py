@@ -0,0 +1,250 @@
+# cv-service/modules/metrics.py
+
+# What it does: Counts and times what the service does per frame, and renders it for Prometheus at /metrics
+# Think of it as: The stopwatch and tally sheet a coach keeps for each drill
+# Prometheus text format written by hand (no client library); all metrics are thread-safe
+#
+# Stages timed per frame (cv_stage_seconds{stage, exercise}):
+#   decode     - JSON / binary landmark packet / base64 JPEG -> data
+#   inference  - pose detection on a frame (frame routers only)
+#   conversion - landmark data -> (N, 4) array
+#   smoothing  - landmark smoothing
+#   analysis   - exercise state machine + feedback
+#   annotate   - drawing landmarks / building the overlay
+#   encode     - annotated frame -> JPEG
+#   send       - writing the response to the WebSocket
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+
+STAGES = ("decode", "inference", "conversion", "smoothing", "analysis", "annotate", "encode", "send")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Current value per label set, or read from `callback` (-> {labels: value}) at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self.callback = callback
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self):
+        if self.callback is not None:
+            items = list(self.callback().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set (values in seconds)."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1  # last bucket slot = above every bound
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return 0 if series is None else series[-1]
+
+    def render(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = self.header()
+        for labels, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """pymongo command monitoring -> latency histogram + failure counter per command name."""
+
+    def succeeded(self, event):
+        mongo_command_seconds.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        mongo_command_seconds.observe(event.duration_micros / 1e6, event.command_name)
+        mongo_command_failures.inc(event.command_name)
+
+    def started(self, event):
+        pass
+
+
+def exercise_label(exercise) -> str:
+    """Exercise enum / name / None -> label value."""
+    if exercise is None:
+        return "none"
+    return getattr(exercise, "name", str(exercise)).lower()
+
+
+@contextmanager
+def stage_timer(stage: str, exercise=None):
+    """Time one pipeline stage: `with stage_timer("encode", exercise): ...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage, exercise_label(exercise))
+
+
+def observe_stage(stage: str, exercise, seconds: float):
+    stage_seconds.observe(seconds, stage, exercise_label(exercise))
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.register(Histogram(
+    "cv_stage_seconds", "Time spent in one per-frame pipeline stage", ("stage", "exercise")
+))
+frame_seconds = registry.register(Histogram(
+    "cv_frame_seconds", "Time from receiving a frame/landmark message to sending its feedback",
+    ("router", "exercise")
+))
+frames_total = registry.register(Counter(
+    "cv_frames_total", "Frames/landmark messages analyzed", ("router", "exercise")
+))
+dropped_frames = registry.register(Counter(
+    "cv_dropped_frames_total", "Frames dropped before analysis (latest-wins ingest, skipped live stream frames)",
+    ("router", "reason")
+))
+active_sessions = registry.register(Gauge(
+    "cv_active_sessions", "Open WebSocket analysis sessions", ("router",)
+))
+detector_fallbacks = registry.register(Counter(
+    "cv_detector_fallbacks_total", "Frame sessions that asked for video mode but run in image mode", ("reason",)
+))
+mongo_command_seconds = registry.register(Histogram(
+    "cv_mongo_command_seconds", "MongoDB command latency", ("command",)
+))
+mongo_command_failures = registry.register(Counter(
+    "cv_mongo_command_failures_total", "Failed MongoDB commands", ("command",)
+))
+routine_cache_requests = registry.register(Counter(
+    "cv_routine_cache_requests_total", "Routine cache lookups", ("result",)
+))
+routine_cache_evictions = registry.register(Counter(
+    "cv_routine_cache_evictions_total", "Routine cache entries dropped (lru, ttl, invalidate)", ("reason",)
+))
@@ -0,0 +1,108 @@
+# cv-service/modules/mongo_indexes.py
+
+# What it does: Declares the MongoDB indexes the routine/user queries rely on and creates them at startup
+# Think of it as: The gym's index cards - find a member's day-3 routine without flipping through every binder
+# Optional explain check (MONGO_EXPLAIN_CHECK=1) refuses to start when a hot query would scan the whole collection
+#
+# Hot queries (workout_routine_api.py):
+#   routines {day, user_id}                    - one routine (get / set mutations / complete)
+#   routines {user_id} sorted by day           - a user's week
+#   routines {user_id: {$exists: false}}       - default templates (copy-default)
+#   users    {user_id}                         - progress / level
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+MONGO_EXPLAIN_CHECK = os.getenv("MONGO_EXPLAIN_CHECK", "0") in ("1", "true")
+
+# Templates have no user_id, so they are indexed under user_id = null: the same index serves the
+# template query (bounds [null, null]) and keeps one template per day. A partialFilterExpression
+# can't select documents *missing* a field, which is why templates share this index instead of
+# getting a partial one of their own.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "routines": [
+        IndexModel([("user_id", ASCENDING), ("day", ASCENDING)], name="user_day", unique=True),
+    ],
+    "users": [
+        IndexModel([("user_id", ASCENDING)], name="user_id", unique=True),
+    ],
+}
+
+# (collection, filter, sort) - must not plan a COLLSCAN once INDEXES exist
+HOT_QUERIES: List[Tuple[str, Dict, Optional[List[Tuple[str, int]]]]] = [
+    ("routines", {"day": 1, "user_id": 1}, None),
+    ("routines", {"user_id": 1}, [("day", ASCENDING)]),
+    ("routines", {"user_id": {"$exists": False}}, None),
+    ("users", {"user_id": 1}, None),
+]
+
+
+class UnindexedQueryError(RuntimeError):
+    """Raised by check_query_plans() when a hot query's winning plan scans the collection."""
+
+
+async def ensure_indexes(db) -> List[str]:
+    """
+    Create the declared indexes (no-op for ones that already exist). Returns the names created or confirmed.
+
+    A failure (e.g. duplicate user_id/day pairs blocking a unique index) is reported and skipped
+    so the service still starts; the explain check will then point at the affected queries.
+    If MongoDB can't be reached, the remaining indexes are skipped too (they are created on the next start).
+    """
+    names = []
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                names.extend(await db[collection].create_indexes([model]))
+            except OperationFailure as e:
+                print(f"Index {collection}.{model.document['name']} not created: {e}")
+            except PyMongoError as e:
+                print(f"MongoDB unreachable, indexes not created: {e}")
+                return names
+    return names
+
+
+def _collection_scans(plan) -> List[Dict]:
+    """Every COLLSCAN stage in an explain() plan tree (classic and SBE layouts)."""
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _collection_scans(item)]
+    if not isinstance(plan, dict):
+        return []
+    found = [plan] if plan.get("stage") == "COLLSCAN" else []
+    for value in plan.values():
+        if isinstance(value, (dict, list)):
+            found.extend(_collection_scans(value))
+    return found
+
+
+async def prepare_indexes(db, explain_check: bool = False):
+    """
+    ensure_indexes() and, with `explain_check`, check_query_plans().
+
+    Never raises for MongoDB being unavailable - only UnindexedQueryError from the explain check.
+    """
+    names = await ensure_indexes(db)
+    print(f"MongoDB indexes ready: {', '.join(names) or 'none'}")
+    if explain_check:
+        try:
+            await check_query_plans(db)
+        except PyMongoError as e:
+            print(f"MongoDB unreachable, query plans not checked: {e}")
+
+
+async def check_query_plans(db):
+    """Explain each hot query and raise UnindexedQueryError listing those whose winning plan is a COLLSCAN."""
+    unindexed = []
+    for collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.explain()
+        if _collection_scans(explained.get("queryPlanner", {}).get("winningPlan")):
+            unindexed.append(f"{collection}.find({query}{f', sort={sort}' if sort else ''})")
+    if unindexed:
+        raise UnindexedQueryError("Hot queries without an index: " + "; ".join(unindexed))
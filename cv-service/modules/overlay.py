@@ -0,0 +1,50 @@
+# cv-service/modules/overlay.py
+
+# What it does: Describes what to draw on top of a frame (skeleton, problem joints, rep text) as small JSON
+# Think of it as: Sending the tracing paper instead of the whole redrawn picture
+# The client already has the frame it sent, so it renders this itself - no JPEG re-encode, a fraction of the bytes
+
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from mediapipe import solutions
+
+from .exercise_analyzer import PostureFeedback
+
+
+RESPONSE_MODES = ("overlay", "jpeg")
+DEFAULT_RESPONSE_MODE = os.getenv("LIVE_RESPONSE_MODE", "overlay")
+ANNOTATED_JPEG_QUALITY = int(os.getenv("ANNOTATED_JPEG_QUALITY", "80"))
+ANNOTATED_JPEG_EVERY = int(os.getenv("ANNOTATED_JPEG_EVERY", "1"))  # jpeg mode: every Nth frame
+OVERLAY_PRECISION = 4  # decimals for normalized coordinates
+
+# Sent once per connection - the same for every frame
+SKELETON_EDGES = sorted([a, b] for a, b in solutions.pose.POSE_CONNECTIONS)
+
+
+def error_joints(feedback: Optional[PostureFeedback]) -> List[int]:
+    """Landmark indices declared ("joints") by the spec rules behind the corrective feedback."""
+    if feedback is None or feedback.is_correct:
+        return []
+    return list(feedback.error_joints)
+
+
+def build_overlay(landmarks: Optional[np.ndarray], feedback: Optional[PostureFeedback], rep_count: int) -> Dict:
+    """
+    Overlay for one frame.
+
+    {
+        "landmarks": [[x, y, visibility], ...] | null,   # normalized to the frame, 33 entries
+        "highlight": [25, 26],                            # joints to draw in the error color
+        "status": "correct" | "incorrect" | "none",
+        "text": "Reps: 3"
+    }
+    Skeleton edges are the same every frame and come with the session message.
+    """
+    return {
+        "landmarks": None if landmarks is None else np.round(landmarks[:, [0, 1, 3]], OVERLAY_PRECISION).tolist(),
+        "highlight": error_joints(feedback),
+        "status": "none" if feedback is None else ("correct" if feedback.is_correct else "incorrect"),
+        "text": f"Reps: {rep_count}",
+    }
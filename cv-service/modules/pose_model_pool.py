@@ -0,0 +1,239 @@
+# cv-service/modules/pose_model_pool.py
+
+# What it does: Keeps a small, shared set of MediaPipe pose detectors for the whole process
+# Think of it as: A rack of cameras that sessions borrow and return instead of buying their own
+# Landmark-only sessions never touch this - only endpoints that receive raw frames check out a detector
+#
+# Running modes:
+#   image       - every frame is detected from scratch; detectors are stateless and shared per call
+#   video       - MediaPipe tracks the pose between frames and skips full detection on most of them;
+#                 a session keeps one detector for as long as it is connected
+#   live_stream - detect_async() returns at once and results arrive on a callback; one detector per connection
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from mediapipe.tasks import python
+from mediapipe.tasks.python import vision
+
+
+DEFAULT_MODEL_PATH = os.getenv("POSE_MODEL_PATH", "pose_landmarker_full.task")
+DEFAULT_POOL_SIZE = int(os.getenv("POSE_POOL_SIZE", "2"))
+DEFAULT_CHECKOUT_TIMEOUT = float(os.getenv("POSE_POOL_TIMEOUT", "5.0"))
+DEFAULT_VIDEO_POOL_SIZE = int(os.getenv("POSE_VIDEO_POOL_SIZE", "8"))  # one per concurrently streaming session
+DEFAULT_RUNNING_MODE = os.getenv("POSE_RUNNING_MODE", "video")  # frame sessions: image / video / live_stream
+
+RUNNING_MODES = ("image", "video", "live_stream")
+_VISION_RUNNING_MODES = {
+    "image": vision.RunningMode.IMAGE,
+    "video": vision.RunningMode.VIDEO,
+    "live_stream": vision.RunningMode.LIVE_STREAM,
+}
+
+
+class PoseModelPoolExhausted(RuntimeError):
+    """Raised when no detector becomes free within the checkout timeout."""
+
+
+def create_pose_landmarker(model_path: str = DEFAULT_MODEL_PATH, running_mode: str = "image",
+                           result_callback: Optional[Callable] = None):
+    """Build a PoseLandmarker in the given running mode (live_stream needs a result_callback)."""
+    base_options = python.BaseOptions(model_asset_path=model_path)
+    options = vision.PoseLandmarkerOptions(
+        base_options=base_options,
+        running_mode=_VISION_RUNNING_MODES[running_mode],
+        output_segmentation_masks=False,
+        result_callback=result_callback,
+    )
+    return vision.PoseLandmarker.create_from_options(options)
+
+
+def monotonic_ms() -> int:
+    return int(time.monotonic() * 1000)
+
+
+class VideoDetector:
+    """
+    VIDEO-mode PoseLandmarker that remembers the last timestamp it was fed.
+
+    MediaPipe rejects timestamps that don't strictly increase, and a pooled
+    detector can move from one session to the next, so timestamps are bumped
+    past the previous one when needed.
+    """
+
+    def __init__(self, landmarker):
+        self._landmarker = landmarker
+        self.last_timestamp_ms = -1
+
+    def detect_for_video(self, image, timestamp_ms: Optional[int] = None):
+        if timestamp_ms is None:
+            timestamp_ms = monotonic_ms()
+        timestamp_ms = max(int(timestamp_ms), self.last_timestamp_ms + 1)
+        self.last_timestamp_ms = timestamp_ms
+        return self._landmarker.detect_for_video(image, timestamp_ms)
+
+    def detect(self, image):
+        return self.detect_for_video(image)
+
+    def close(self):
+        self._landmarker.close()
+
+
+class LiveStreamDetector:
+    """
+    Per-connection LIVE_STREAM PoseLandmarker.
+
+    `detect_async` returns immediately; MediaPipe drops frames it can't keep up
+    with, and each finished result is put on `results` (an asyncio.Queue on the
+    connection's event loop) as (timestamp_ms, PoseLandmarkerResult). A caller
+    can attach a payload per frame (e.g. the frame itself) and get it back with
+    `pop_payload` - payloads of frames MediaPipe skipped are discarded then.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, model_path: str = DEFAULT_MODEL_PATH):
+        self.results: asyncio.Queue = asyncio.Queue()
+        self._loop = loop
+        self._payloads: Dict[int, object] = {}
+        self._lock = threading.Lock()
+        self.last_timestamp_ms = -1
+        self.skipped = 0  # frames MediaPipe dropped without producing a result
+        self._landmarker = create_pose_landmarker(model_path, "live_stream", self._on_result)
+
+    def _on_result(self, result, _output_image, timestamp_ms: int):
+        # Called on a MediaPipe thread
+        self._loop.call_soon_threadsafe(self.results.put_nowait, (timestamp_ms, result))
+
+    def detect_async(self, image, timestamp_ms: Optional[int] = None, payload: object = None) -> int:
+        if timestamp_ms is None:
+            timestamp_ms = monotonic_ms()
+        with self._lock:
+            timestamp_ms = max(int(timestamp_ms), self.last_timestamp_ms + 1)
+            self.last_timestamp_ms = timestamp_ms
+            self._payloads[timestamp_ms] = payload
+        self._landmarker.detect_async(image, timestamp_ms)
+        return timestamp_ms
+
+    def pop_payload(self, timestamp_ms: int) -> object:
+        with self._lock:
+            for stale in [ts for ts in self._payloads if ts < timestamp_ms]:
+                del self._payloads[stale]
+                self.skipped += 1
+            return self._payloads.pop(timestamp_ms, None)
+
+    def close(self):
+        self._landmarker.close()
+
+
+class PoseModelPool:
+    """Process-wide, lazily-initialized, bounded pool of PoseLandmarker instances."""
+
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH, max_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_CHECKOUT_TIMEOUT, running_mode: str = "image"):
+        if running_mode not in ("image", "video"):
+            raise ValueError(f"Pooled detectors must be image or video mode, got: {running_mode}")
+        self.model_path = model_path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.running_mode = running_mode
+
+        self._idle = queue.LifoQueue()  # LIFO keeps the most recently used (warm) detector busy
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+
+    def _create_detector(self):
+        """Build a new detector. Only called while a free slot is reserved."""
+        landmarker = create_pose_landmarker(self.model_path, self.running_mode)
+        if self.running_mode == "video":
+            return VideoDetector(landmarker)
+        return landmarker
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Take a detector out of the pool, creating one if the pool is not full yet."""
+        if self._closed:
+            raise RuntimeError("Pose model pool is closed")
+
+        try:
+            detector = self._idle.get_nowait()
+        except queue.Empty:
+            detector = None
+
+        if detector is None:
+            with self._lock:
+                can_create = self._created < self.max_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    detector = self._create_detector()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                wait = self.timeout if timeout is None else timeout
+                try:
+                    detector = self._idle.get(timeout=wait)
+                except queue.Empty:
+                    raise PoseModelPoolExhausted(
+                        f"No pose detector available after {wait}s (pool size {self.max_size})"
+                    )
+
+        with self._lock:
+            self._in_use += 1
+        return detector
+
+    def release(self, detector):
+        """Return a detector to the pool."""
+        with self._lock:
+            self._in_use -= 1
+        if self._closed:
+            detector.close()
+            with self._lock:
+                self._created -= 1
+        else:
+            self._idle.put(detector)
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None):
+        """Borrow a detector for the duration of a `with` block."""
+        detector = self.acquire(timeout)
+        try:
+            yield detector
+        finally:
+            self.release(detector)
+
+    def stats(self) -> Dict:
+        """Pool status for health/debug endpoints."""
+        with self._lock:
+            return {
+                "model_path": self.model_path,
+                "running_mode": self.running_mode,
+                "max_size": self.max_size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+            }
+
+    def close(self):
+        """Close every idle detector. Checked-out detectors are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                detector = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            detector.close()
+            with self._lock:
+                self._created -= 1
+
+
+# Shared pools for the whole process: stateless per-call detection, and per-session VIDEO tracking
+pose_model_pool = PoseModelPool()
+video_pose_model_pool = PoseModelPool(max_size=DEFAULT_VIDEO_POOL_SIZE, running_mode="video")
@@ -0,0 +1,137 @@
+# cv-service/modules/roi_tracker.py
+
+# What it does: Shrinks what the pose detector has to look at - a crop around the body, at an adaptive size
+# Think of it as: A camera operator who zooms in on the athlete and drops to a lower resolution when the crew is overloaded
+# Falls back to the full frame whenever the body is lost, and maps landmarks back to full-frame coordinates
+#
+# In VIDEO running mode MediaPipe tracks its own region of interest in normalized frame coordinates,
+# so cropping would move the ground under it; there only the resolution adapts (crop=False).
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+ROI_MARGIN = float(os.getenv("ROI_MARGIN", "0.25"))  # added on each side, as a fraction of the body box
+ROI_MIN_VISIBILITY = float(os.getenv("ROI_MIN_VISIBILITY", "0.5"))  # landmarks used for the box
+ROI_MIN_SIZE = float(os.getenv("ROI_MIN_SIZE", "0.2"))  # smallest crop, as a fraction of the frame
+INFERENCE_MAX_SIDE = int(os.getenv("INFERENCE_MAX_SIDE", "640"))  # longest side fed to the detector
+INFERENCE_MIN_SIDE = int(os.getenv("INFERENCE_MIN_SIDE", "256"))
+INFERENCE_TARGET_MS = float(os.getenv("INFERENCE_TARGET_MS", "40"))  # per-frame detection budget
+
+
+@dataclass
+class RoiTransform:
+    """Where the detector input came from: crop origin/size in pixels and the frame size."""
+    x0: int
+    y0: int
+    width: int
+    height: int
+    frame_width: int
+    frame_height: int
+
+    @property
+    def is_full_frame(self) -> bool:
+        return self.x0 == 0 and self.y0 == 0 and self.width == self.frame_width and self.height == self.frame_height
+
+
+class RoiTracker:
+    """
+    Per-session crop + resolution controller for frame-based inference.
+
+    Usage per frame:
+        detector_input, transform = tracker.prepare(frame)
+        landmarks = ... detect on detector_input ...
+        landmarks = tracker.to_frame(landmarks, transform)
+        tracker.update(landmarks, inference_ms)
+    """
+
+    def __init__(self, margin: float = ROI_MARGIN, min_visibility: float = ROI_MIN_VISIBILITY,
+                 min_size: float = ROI_MIN_SIZE, max_side: int = INFERENCE_MAX_SIDE,
+                 min_side: int = INFERENCE_MIN_SIDE, target_ms: float = INFERENCE_TARGET_MS):
+        self.margin = margin
+        self.min_visibility = min_visibility
+        self.min_size = min_size
+        self.max_side_limit = max_side
+        self.min_side = min(min_side, max_side)
+        self.target_ms = target_ms
+
+        self.max_side = max_side  # current inference size, adapted by update()
+        self.latency_ms: Optional[float] = None  # smoothed inference latency
+        self.roi: Optional[Tuple[float, float, float, float]] = None  # normalized x0, y0, x1, y1
+        self.lost_frames = 0
+
+    def reset(self):
+        self.roi = None
+        self.lost_frames = 0
+
+    def prepare(self, frame: np.ndarray, crop: bool = True) -> Tuple[np.ndarray, RoiTransform]:
+        """Crop around the last known body (if tracking and `crop`) and downscale to the current size."""
+        frame_height, frame_width = frame.shape[:2]
+        x0, y0, x1, y1 = 0, 0, frame_width, frame_height
+        if crop and self.roi is not None:
+            rx0, ry0, rx1, ry1 = self.roi
+            x0, y0 = int(rx0 * frame_width), int(ry0 * frame_height)
+            x1, y1 = int(np.ceil(rx1 * frame_width)), int(np.ceil(ry1 * frame_height))
+
+        region = frame[y0:y1, x0:x1]
+        height, width = region.shape[:2]
+        scale = self.max_side / max(width, height)
+        if scale < 1.0:  # never upscale
+            region = cv2.resize(region, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                interpolation=cv2.INTER_AREA)
+        elif not region.flags['C_CONTIGUOUS']:
+            region = np.ascontiguousarray(region)
+        return region, RoiTransform(x0, y0, width, height, frame_width, frame_height)
+
+    def to_frame(self, landmarks: Optional[np.ndarray], transform: RoiTransform) -> Optional[np.ndarray]:
+        """Map (N, 4) landmarks normalized to the detector input back to full-frame normalized coordinates."""
+        if landmarks is None or transform.is_full_frame:
+            return landmarks
+        mapped = landmarks.copy()
+        mapped[:, 0] = (landmarks[:, 0] * transform.width + transform.x0) / transform.frame_width
+        mapped[:, 1] = (landmarks[:, 1] * transform.height + transform.y0) / transform.frame_height
+        mapped[:, 2] = landmarks[:, 2] * transform.width / transform.frame_width  # z shares x's scale
+        return mapped
+
+    def update(self, landmarks: Optional[np.ndarray], inference_ms: Optional[float] = None):
+        """Track the body box from full-frame landmarks (None = lost) and adapt the inference size."""
+        self._update_roi(landmarks)
+        if inference_ms is not None:
+            self._update_resolution(inference_ms)
+
+    def _update_roi(self, landmarks: Optional[np.ndarray]):
+        visible = None if landmarks is None else landmarks[landmarks[:, 3] >= self.min_visibility, :2]
+        if visible is None or len(visible) < 4:
+            # Tracking lost -> next frame uses the whole image
+            self.roi = None
+            self.lost_frames += 1
+            return
+
+        self.lost_frames = 0
+        (bx0, by0), (bx1, by1) = visible.min(axis=0).tolist(), visible.max(axis=0).tolist()
+        pad_x = max((bx1 - bx0) * self.margin, (self.min_size - (bx1 - bx0)) / 2, 0.0)
+        pad_y = max((by1 - by0) * self.margin, (self.min_size - (by1 - by0)) / 2, 0.0)
+        self.roi = (
+            max(0.0, bx0 - pad_x), max(0.0, by0 - pad_y),
+            min(1.0, bx1 + pad_x), min(1.0, by1 + pad_y),
+        )
+
+    def _update_resolution(self, inference_ms: float):
+        self.latency_ms = inference_ms if self.latency_ms is None else 0.8 * self.latency_ms + 0.2 * inference_ms
+        if self.latency_ms > self.target_ms * 1.1:
+            self.max_side = max(self.min_side, int(self.max_side * 0.85))
+        elif self.latency_ms < self.target_ms * 0.6:
+            self.max_side = min(self.max_side_limit, int(self.max_side * 1.15) + 1)
+
+    def stats(self) -> dict:
+        return {
+            "tracking": self.roi is not None,
+            "roi": None if self.roi is None else [round(float(v), 4) for v in self.roi],
+            "max_side": self.max_side,
+            "latency_ms": None if self.latency_ms is None else round(self.latency_ms, 2),
+            "lost_frames": self.lost_frames,
+        }
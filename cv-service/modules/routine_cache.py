@@ -0,0 +1,116 @@
+# cv-service/modules/routine_cache.py
+
+# What it does: Keeps recently read routines in memory (LRU + TTL) so repeat reads skip MongoDB
+# Think of it as: The trainer keeping today's clipboards at hand instead of walking to the filing cabinet each time
+# Per process: writes made through this process update/invalidate it; other workers' writes show up after the TTL
+#
+# Keys are (user_id, day) for one routine, plus per-user views: (user_id, "all") for the routine list and
+# (user_id, "summary") for the per-day totals. Any change to a user's routine drops that user's views.
+# Hits/misses/evictions are counted on /metrics (cv_routine_cache_*).
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from .metrics import routine_cache_requests, routine_cache_evictions
+
+
+ROUTINE_CACHE_SIZE = int(os.getenv("ROUTINE_CACHE_SIZE", "1024"))  # entries (routines + per-user views)
+ROUTINE_CACHE_TTL = float(os.getenv("ROUTINE_CACHE_TTL", "30"))  # seconds; 0 disables the cache
+
+USER_VIEWS = ("all", "summary")
+
+
+class RoutineCache:
+    """
+    LRU cache of routine documents (as returned by the API) with a time-to-live per entry.
+
+    Only used from the event loop (async endpoints), so no locking. Values are shared, not
+    copied - callers must not mutate what get() returns.
+
+    Readers take generation() before querying MongoDB and pass it to put(); if a write
+    invalidated anything in between, the possibly stale result is not cached.
+    """
+
+    def __init__(self, max_entries: int = ROUTINE_CACHE_SIZE, ttl: float = ROUTINE_CACHE_TTL):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (user_id, key) -> (expires, value)
+        self._generation = 0  # bumped by every write
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id, key: Hashable) -> Optional[Any]:
+        """Cached value for (user_id, key) - a day number or a view name - or None (counted as a miss)."""
+        entry = self._entries.get((user_id, key))
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end((user_id, key))
+                routine_cache_requests.inc("hit")
+                return value
+            del self._entries[(user_id, key)]
+            routine_cache_evictions.inc("ttl")
+        routine_cache_requests.inc("miss")
+        return None
+
+    def generation(self) -> int:
+        return self._generation
+
+    def put(self, user_id, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Cache a value read from MongoDB; skipped if a write happened since `generation`."""
+        if not self.enabled or (generation is not None and generation != self._generation):
+            return
+        self._entries[(user_id, key)] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end((user_id, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            routine_cache_evictions.inc("lru")
+
+    def update_exercise(self, user_id, day: int, exercise: Dict):
+        """Swap in an exercise returned by a write (keeps the cached routine warm); the user's views are dropped."""
+        self._generation += 1
+        self._drop_views(user_id)
+        entry = self._entries.get((user_id, day))
+        if entry is None:
+            return
+        expires, routine = entry
+        exercises = [exercise if e["id"] == exercise["id"] else e for e in routine["exercises"]]
+        self._entries[(user_id, day)] = (expires, {**routine, "exercises": exercises})
+
+    def invalidate(self, user_id, day: Optional[int] = None):
+        """Drop one routine (and the user's views), or everything cached for the user when day is None."""
+        self._generation += 1
+        if day is None:
+            keys = [key for key in self._entries if key[0] == user_id]
+        else:
+            keys = [(user_id, day)] + [(user_id, view) for view in USER_VIEWS]
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                routine_cache_evictions.inc("invalidate")
+
+    def _drop_views(self, user_id):
+        for view in USER_VIEWS:
+            if self._entries.pop((user_id, view), None) is not None:
+                routine_cache_evictions.inc("invalidate")
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": routine_cache_requests.value("hit"),
+            "misses": routine_cache_requests.value("miss"),
+        }
+
+
+routine_cache = RoutineCache()
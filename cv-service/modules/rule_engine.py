@@ -0,0 +1,642 @@
+# cv-service/modules/rule_engine.py
+
+# What it does: Turns declarative exercise specs (JSON) into fast per-frame analysis functions
+# Think of it as: A rulebook the trainer reads from, instead of rules memorized by heart - edit the page, the trainer follows
+# Each spec is compiled once into straight-line Python that evaluates only what a rule reads; edited specs reload live
+#
+# Spec layout (see exercise_specs/*.json):
+#   exercise          Exercise enum name
+#   angles            {name: [a, b, c]} - angle at b; a point is "left_knee" or {"point": "mid_hip", "offset": [0, 0.1]}
+#   features          {name: expression} - scalars over points (<point>_x / <point>_y), angles and other features
+#   baselines         {name: expression} - captured the first time it is read, then kept until the session resets
+#   position          [{when, message, angle_data?, confidence?, rep_quality?, joints?}] - early exits, checked in order
+#   checks            [{when, message, incorrect? (default true), elif?, joints?}] - form feedback
+#   rep_quality       expression (message_count = messages so far)
+#   states            optional list of valid states; anything else is reset to "ready" first
+#   transitions       [{when, from? | not_from?, to, count?, message?, message_when?, timer? ("start" | "stop")}]
+#                     - the first matching transition fires
+#   range_checks      like checks, evaluated after the transitions (state is the new state)
+#   joints            [point, ...] on a position/check rule - landmarks the overlay highlights when it fires
+#                     (a midpoint stands for its two landmarks); PostureFeedback.error_joints collects them
+#   angle_data        {key: expression}
+#   history           [feature, ...] - numeric values recorded per frame in the session's FrameHistory (primary first)
+#   tempo             {feature, turn: "min" | "max", first: "eccentric" | "concentric"} - per-rep phase timing of a
+#                     history feature (see kinematics.rep_tempo)
+#   default_message   sent when there is no other message
+#   confidence        expression, usually visibility(<points>...)
+#
+# Expressions are a safe subset of Python: arithmetic, comparisons, and/or/not, x if c else y, "strings",
+# abs/min/max, visibility(points...) and steady(feature, max_change_per_second).
+# Special names: state, rep_count, is_correct, message_count, rep_quality, hold_time.
+
+import ast
+import json
+import logging
+import os
+import re
+import string
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+SPEC_DIR = os.getenv("EXERCISE_SPEC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "exercise_specs"))
+SPEC_RELOAD_INTERVAL = float(os.getenv("EXERCISE_SPEC_RELOAD_INTERVAL", "2"))  # seconds between mtime checks; 0 = off
+
+logger = logging.getLogger(__name__)
+
+FUNCTIONS = ("abs", "min", "max", "visibility", "steady")
+BIN_OPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.FloorDiv: "//", ast.Mod: "%", ast.Pow: "**"}
+UNARY_OPS = {ast.Not: "not ", ast.USub: "-", ast.UAdd: "+"}
+COMPARE_OPS = {ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=", ast.Eq: "==", ast.NotEq: "!=",
+               ast.In: "in", ast.NotIn: "not in"}
+# name -> generated code, and the stage from which the name may be read
+SPECIAL_NAMES = {
+    "state": ("analyzer.exercise_state", "position"),
+    "rep_count": ("analyzer.rep_count", "position"),
+    "is_correct": ("is_correct", "checks"),
+    "message_count": ("len(messages)", "checks"),
+    "rep_quality": ("rep_quality", "transitions"),
+    "hold_time": ("hold_time", "range_checks"),
+}
+STAGES = ("position", "checks", "rep_quality", "transitions", "range_checks", "output")
+# Locals of the generated function - spec names may not reuse them
+RESERVED = {"analyzer", "landmarks", "points", "angles", "lm", "messages", "name"}
+
+
+class SpecError(ValueError):
+    """A spec that cannot be compiled (bad expression, unknown name, cycle, ...)."""
+
+
+@dataclass
+class CompiledSpec:
+    exercise: str
+    evaluate: Callable  # (analyzer, landmarks, points, angles) -> PostureFeedback
+    angles: Callable  # body_points array (..., P, 2) -> (..., K) angles, K = len(angle_names)
+    angle_names: List[str]
+    history_names: List[str]
+    tempo: Optional[Dict]
+    graph: "FeatureGraph"
+    source: str
+    path: Optional[str] = None
+    mtime: float = 0.0
+    replaced: bool = False  # set when a reload swaps in a newer version (sessions re-bind, see set_exercise)
+
+
+def _visibility(landmarks, indices) -> float:
+    """Minimum visibility of the given landmarks (0.0 if any is missing)."""
+    if landmarks is None or not indices or len(landmarks) <= max(indices):
+        return 0.0
+    return float(landmarks[list(indices), 3].min())
+
+
+def _steady(analyzer, key: str, value: float, max_rate: float) -> bool:
+    """False when `value` changes faster than `max_rate` per second of capture time (too fast to count)."""
+    return analyzer.check_movement_speed(value, key, max_rate)
+
+
+@dataclass
+class FeatureNode:
+    name: str
+    kind: str  # "point" (midpoint coordinate), "angle", "angles" (the shared vectorized pass), "feature", "baseline"
+    code: Optional[str] = None
+    deps: Set[str] = field(default_factory=set)
+    specials: Set[str] = field(default_factory=set)  # special names (state, rep_quality, ...) it reads
+
+
+class FeatureGraph:
+    """
+    Everything a spec can read per frame, and what each value depends on.
+
+    Landmark coordinates are read straight from the landmark list; midpoint coordinates,
+    features and baselines are scalar nodes; all angles hang off one "angles" node (one
+    vectorized pass for the whole spec). order() returns the nodes to evaluate, dependencies
+    first, so each rule only pays for the values it actually reads - once per frame.
+    """
+
+    ANGLES = "<angles>"
+
+    def __init__(self, spec: Dict, points: Dict[str, int], midpoints: Dict[str, Tuple[int, int]], name: str):
+        self.name = name
+        self.points = points
+        self.midpoints = midpoints
+        self.angle_names: List[str] = list(spec.get("angles", {}))
+        self.nodes: Dict[str, FeatureNode] = {}
+        for group in ("angles", "features", "baselines"):
+            for key in spec.get(group, {}):
+                if key in SPECIAL_NAMES or key in FUNCTIONS or key in RESERVED or key in self.nodes \
+                        or self._coord(key) or not key.isidentifier():
+                    raise SpecError(f"{name}: '{key}' shadows a built-in or duplicate name")
+                self.nodes[key] = FeatureNode(key, group.rstrip("s") if group != "angles" else "angle")
+        if self.angle_names:
+            self.nodes[self.ANGLES] = FeatureNode(self.ANGLES, "angles")
+            for key in self.angle_names:
+                self.nodes[key].deps = {self.ANGLES}
+        for group in ("features", "baselines"):
+            for key, text in spec.get(group, {}).items():
+                node = self.nodes[key]
+                node.code, node.deps, node.specials = self.expr(text, f"{group}.{key}")
+        self._check_cycles()
+
+    # --- expressions ---------------------------------------------------------------------------
+
+    def _coord(self, name: str) -> Optional[Tuple[str, int]]:
+        match = re.fullmatch(r"(\w+)_([xy])", name)
+        if match and match.group(1) in self.points:
+            return match.group(1), 0 if match.group(2) == "x" else 1
+        return None
+
+    def _coord_code(self, name: str) -> Optional[str]:
+        """Landmark coordinates are inlined; midpoint coordinates become (memoized) point nodes."""
+        coord = self._coord(name)
+        if coord is None:
+            return None
+        point, axis = coord
+        if point in self.midpoints:
+            if name not in self.nodes:
+                i, j = self.midpoints[point]
+                self.nodes[name] = FeatureNode(name, "point", f"((lm[{i}][{axis}] + lm[{j}][{axis}]) / 2)")
+            return name
+        return f"lm[{self.points[point]}][{axis}]"
+
+    def expr(self, text, where: str) -> Tuple[str, Set[str], Set[str]]:
+        """(python source, graph nodes it reads, special names it reads) for a spec expression."""
+        if isinstance(text, bool) or text is None or isinstance(text, (int, float)):
+            return repr(text), set(), set()
+        if not isinstance(text, str):
+            raise SpecError(f"{self.name}: {where}: expected an expression, got {text!r}")
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError as e:
+            raise SpecError(f"{self.name}: {where}: {e.msg} in {text!r}") from None
+        names: Set[str] = set()
+        specials: Set[str] = set()
+        return self._node(tree.body, names, specials, where), names, specials
+
+    def _node(self, node, names: Set[str], specials: Set[str], where: str) -> str:
+        sub = lambda n: self._node(n, names, specials, where)  # noqa: E731
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool, type(None))):
+            return repr(node.value)
+        if isinstance(node, ast.Name):
+            return self.name_code(node.id, names, specials, where)
+        if isinstance(node, ast.BoolOp):
+            op = " and " if isinstance(node.op, ast.And) else " or "
+            return "(" + op.join(sub(v) for v in node.values) + ")"
+        if isinstance(node, ast.BinOp) and type(node.op) in BIN_OPS:
+            return f"({sub(node.left)} {BIN_OPS[type(node.op)]} {sub(node.right)})"
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPS:
+            return f"({UNARY_OPS[type(node.op)]}{sub(node.operand)})"
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARE_OPS for op in node.ops):
+            parts = [sub(node.left)]
+            for op, right in zip(node.ops, node.comparators):
+                parts += [COMPARE_OPS[type(op)], sub(right)]
+            return "(" + " ".join(parts) + ")"
+        if isinstance(node, ast.IfExp):
+            return f"({sub(node.body)} if {sub(node.test)} else {sub(node.orelse)})"
+        if isinstance(node, (ast.List, ast.Tuple)):
+            items = [sub(e) for e in node.elts]
+            return "(" + ", ".join(items) + ("," if len(items) == 1 else "") + ")"
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            return self._call(node.func.id, node.args, sub, where)
+        raise SpecError(f"{self.name}: {where}: unsupported expression element {type(node).__name__}")
+
+    def _call(self, func: str, args, sub: Callable, where: str) -> str:
+        if func in ("abs", "min", "max"):
+            return f"{func}(" + ", ".join(sub(a) for a in args) + ")"
+        if func == "visibility":
+            indices = []
+            for a in args:
+                if not isinstance(a, ast.Name) or a.id not in self.points or a.id in self.midpoints:
+                    raise SpecError(f"{self.name}: {where}: visibility() takes landmark names")
+                indices.append(self.points[a.id])
+            return f"_visibility(landmarks, {tuple(indices)!r})"
+        if func == "steady":
+            if len(args) != 2 or not isinstance(args[0], ast.Name):
+                raise SpecError(f"{self.name}: {where}: steady(feature, max_change_per_second)")
+            return f"_steady(analyzer, {args[0].id!r}, {sub(args[0])}, {sub(args[1])})"
+        raise SpecError(f"{self.name}: {where}: unknown function {func}()")
+
+    def name_code(self, name: str, names: Set[str], specials: Set[str], where: str) -> str:
+        coord = self._coord_code(name)
+        if coord is not None:
+            if coord == name:
+                names.add(name)
+            return coord
+        if name in SPECIAL_NAMES:
+            specials.add(name)
+            return SPECIAL_NAMES[name][0]
+        if name in self.nodes:
+            names.add(name)
+            return name
+        if name in ("True", "False", "None"):
+            return name
+        raise SpecError(f"{self.name}: {where}: unknown name '{name}'")
+
+    # --- graph ---------------------------------------------------------------------------------
+
+    def _check_cycles(self):
+        done: Set[str] = set()
+
+        def visit(name: str, path: List[str]):
+            if name in path:
+                raise SpecError(f"{self.name}: feature cycle: {' -> '.join(path[path.index(name):] + [name])}")
+            if name in done:
+                return
+            for dep in sorted(self.nodes[name].deps):
+                visit(dep, path + [name])
+            done.add(name)
+
+        for name in list(self.nodes):
+            visit(name, [])
+
+    def order(self, names: Set[str], skip: Set[str] = frozenset()) -> List[str]:
+        """Nodes needed to evaluate `names`, dependencies first, leaving out already-evaluated `skip`."""
+        ordered: List[str] = []
+        seen = set(skip)
+
+        def visit(name: str):
+            if name in seen:
+                return
+            seen.add(name)
+            for dep in sorted(self.nodes[name].deps):
+                visit(dep)
+            ordered.append(name)
+
+        for name in sorted(names):
+            visit(name)
+        return ordered
+
+    def specials(self, names: List[str]) -> Set[str]:
+        return set().union(*(self.nodes[n].specials for n in names)) if names else set()
+
+
+class _Compiler:
+    """Compiles one spec dict into the source of an `evaluate` function."""
+
+    def __init__(self, spec: Dict, graph: FeatureGraph, name: str):
+        self.spec = spec
+        self.graph = graph
+        self.name = name
+        self.lines: List[str] = []
+        self.emitted: Set[str] = set()
+        self.stage = "position"
+
+    # --- expressions ---------------------------------------------------------------------------
+
+    def _available(self, specials: Set[str], where: str):
+        for name in specials:
+            available_from = SPECIAL_NAMES[name][1]
+            if STAGES.index(self.stage) < STAGES.index(available_from):
+                raise SpecError(f"{self.name}: {where}: '{name}' is not available before {available_from}")
+
+    def expr(self, text, where: str) -> Tuple[str, Set[str]]:
+        """(python source, graph nodes it reads) for a spec expression used at the current stage."""
+        code, names, specials = self.graph.expr(text, where)
+        self._available(specials, where)
+        return code, names
+
+    def message(self, template, where: str) -> Tuple[str, Set[str]]:
+        """Message text; {name} placeholders are filled from features / special names."""
+        if not isinstance(template, str):
+            raise SpecError(f"{self.name}: {where}: message must be a string")
+        fields = [f for _, f, _, _ in string.Formatter().parse(template) if f]
+        if not fields:
+            return repr(template), set()
+        names: Set[str] = set()
+        specials: Set[str] = set()
+        arguments = ", ".join(f"{f}={self.graph.name_code(f, names, specials, where)}" for f in dict.fromkeys(fields))
+        self._available(specials, where)
+        return f"{template!r}.format({arguments})", names
+
+    # --- code emission -------------------------------------------------------------------------
+
+    def emit(self, line: str, indent: int = 1):
+        self.lines.append("    " * indent + line)
+
+    def need(self, names: Set[str]):
+        """Emit the graph nodes the next statement reads (dependencies first); each is evaluated once per frame."""
+        order = self.graph.order(names, self.emitted)
+        self._available(self.graph.specials(order), f"features {', '.join(order)}")
+        for name in order:
+            node = self.graph.nodes[name]
+            if node.kind == "angles":
+                names = self.graph.angle_names
+                self.emit("if angles is None:")
+                self.emit("angles = _angles(_body_points(landmarks) if points is None else points).tolist()", 2)
+                self.emit(", ".join(names) + ("," if len(names) == 1 else "") + " = angles")
+            elif node.kind == "baseline":
+                self.emit(f"{name} = analyzer.baselines.get({name!r})")
+                self.emit(f"if {name} is None:")
+                self.emit(f"{name} = analyzer.baselines[{name!r}] = {node.code}", 2)
+            elif node.kind != "angle":
+                self.emit(f"{name} = {node.code}")
+            self.emitted.add(name)
+
+    def angle_data(self, mapping: Dict, where: str) -> Tuple[str, Set[str]]:
+        items, names = [], set()
+        for key, value in mapping.items():
+            code, deps = self.expr(value, f"{where}.{key}")
+            items.append(f"{key!r}: {code}")
+            names |= deps
+        return "{" + ", ".join(items) + "}", names
+
+    def joints(self, rule: Dict, where: str) -> Tuple[int, ...]:
+        """Landmark indices of a rule's "joints" (midpoints expand to both landmarks)."""
+        names = rule.get("joints", [])
+        if not isinstance(names, list):
+            raise SpecError(f"{self.name}: {where}: joints must be a list of point names")
+        indices = set()
+        for point in names:
+            if point in self.graph.midpoints:
+                indices.update(self.graph.midpoints[point])
+            elif point in self.graph.points:
+                indices.add(self.graph.points[point])
+            else:
+                raise SpecError(f"{self.name}: {where}: unknown point '{point}'")
+        return tuple(sorted(indices))
+
+    def check_chains(self, checks: List[Dict], where: str):
+        """checks -> if/elif chains; dependencies of a whole chain are emitted before it."""
+        chains: List[List[Tuple[int, Dict]]] = []
+        for i, check in enumerate(checks):
+            if check.get("elif") and chains:
+                chains[-1].append((i, check))
+            else:
+                chains.append([(i, check)])
+        for chain in chains:
+            compiled, deps = [], set()
+            for i, check in chain:
+                condition, names = self.expr(check["when"], f"{where}[{i}].when")
+                message, message_names = self.message(check["message"], f"{where}[{i}].message")
+                joints = self.joints(check, f"{where}[{i}].joints")
+                compiled.append((condition, message, check.get("incorrect", True), joints))
+                deps |= names | message_names
+            self.need(deps)
+            for k, (condition, message, incorrect, joints) in enumerate(compiled):
+                self.emit(f"{'if' if k == 0 else 'elif'} {condition}:")
+                self.emit(f"messages.append({message})", 2)
+                if incorrect:
+                    self.emit("is_correct = False", 2)
+                if joints:
+                    self.emit(f"joints.update({joints!r})", 2)
+
+    def compile(self) -> str:
+        spec = self.spec
+        self.emit_header()
+
+        # 1. Position checks - each only pays for what it reads
+        self.stage = "position"
+        for i, exit_ in enumerate(spec.get("position", [])):
+            condition, deps = self.expr(exit_["when"], f"position[{i}].when")
+            data, data_deps = self.angle_data(exit_.get("angle_data", {"rep_count": "rep_count"}), f"position[{i}].angle_data")
+            message, message_deps = self.message(exit_["message"], f"position[{i}].message")
+            confidence, confidence_deps = self.expr(exit_.get("confidence", 0.5), f"position[{i}].confidence")
+            quality, quality_deps = self.expr(exit_.get("rep_quality", 0.0), f"position[{i}].rep_quality")
+            joints = self.joints(exit_, f"position[{i}].joints")
+            self.need(deps | data_deps | message_deps | confidence_deps | quality_deps)
+            self.emit(f"if {condition}:")
+            self.emit(f"return _Feedback(False, [{message}], {data}, {confidence}, {quality}, {joints!r})", 2)
+
+        # 2. Form checks
+        self.stage = "checks"
+        self.emit("messages = []")
+        self.emit("is_correct = True")
+        self.emit("joints = set()")
+        self.check_chains(spec.get("checks", []), "checks")
+
+        # 3. Rep quality
+        self.stage = "rep_quality"
+        quality, deps = self.expr(spec.get("rep_quality", "1.0 if is_correct else 0.5"), "rep_quality")
+        self.need(deps)
+        self.emit(f"rep_quality = {quality}")
+
+        # 4. State machine
+        self.stage = "transitions"
+        if spec.get("states"):
+            self.emit(f"if analyzer.exercise_state not in {tuple(spec['states'])!r}:")
+            self.emit("analyzer.exercise_state = 'ready'", 2)
+        self.transitions(spec.get("transitions", []))
+
+        # 5. Range-of-motion feedback (sees the new state)
+        self.stage = "range_checks"
+        self.check_chains(spec.get("range_checks", []), "range_checks")
+
+        # 6. Result
+        self.stage = "output"
+        data, data_deps = self.angle_data(spec.get("angle_data", {"rep_count": "rep_count"}), "angle_data")
+        confidence, confidence_deps = self.expr(spec.get("confidence", 0.5), "confidence")
+        history = spec.get("history", [])
+        for name in history:
+            if name not in self.graph.nodes or self.graph.nodes[name].kind == "angles":
+                raise SpecError(f"{self.name}: history: unknown feature '{name}'")
+        tempo = spec.get("tempo")
+        if tempo is not None and (tempo.get("feature") not in history or tempo.get("turn", "min") not in ("min", "max")
+                                  or tempo.get("first", "eccentric") not in ("eccentric", "concentric")):
+            raise SpecError(f"{self.name}: tempo: needs a history feature, turn min/max and first eccentric/concentric")
+        self.need(data_deps | confidence_deps | set(history))
+        if history:
+            self.emit(f"analyzer.history.append(analyzer.current_time(), ({', '.join(history)},))")
+        default, _ = self.message(spec.get("default_message", ""), "default_message")
+        self.emit("if analyzer.log.debug:")
+        local_names = sorted(n for n in self.emitted if n != FeatureGraph.ANGLES)
+        self.emit(f"analyzer.log.debug_event({self.spec['exercise']!r}, is_correct=is_correct, state=analyzer.exercise_state, "
+                  + "".join(f"{n}={n}, " for n in local_names) + "messages=list(messages))", 2)
+        self.emit(f"return _Feedback(is_correct, messages if messages else [{default}], {data}, {confidence}, rep_quality, "
+                  "tuple(sorted(joints)))")
+        return "\n".join(self.lines) + "\n"
+
+    def emit_header(self):
+        # points / angles may be precomputed by the caller (analyze_pose_batch); otherwise the angle pass
+        # runs on first use, so frames that exit early never compute it
+        self.lines.append("def evaluate(analyzer, landmarks, points=None, angles=None):")
+        self.emit("lm = landmarks.tolist()")
+
+    def transitions(self, transitions: List[Dict]):
+        compiled, deps = [], set()
+        for i, t in enumerate(transitions):
+            where = f"transitions[{i}]"
+            condition, names = self.expr(t["when"], f"{where}.when")
+            deps |= names
+            if "from" in t:
+                condition = f"{condition} and analyzer.exercise_state in {tuple(t['from'])!r}"
+            elif "not_from" in t:
+                condition = f"{condition} and analyzer.exercise_state not in {tuple(t['not_from'])!r}"
+            message = message_when = None
+            if "message" in t:
+                message, names = self.message(t["message"], f"{where}.message")
+                deps |= names
+                if "message_when" in t:
+                    message_when, names = self.expr(t["message_when"], f"{where}.message_when")
+                    deps |= names
+            if t.get("timer") not in (None, "start", "stop"):
+                raise SpecError(f"{self.name}: {where}.timer must be 'start' or 'stop'")
+            compiled.append((condition, t, message, message_when))
+        self.need(deps)
+        for k, (condition, t, message, message_when) in enumerate(compiled):
+            self.emit(f"{'if' if k == 0 else 'elif'} {condition}:")
+            self.emit(f"analyzer.exercise_state = {t['to']!r}", 2)
+            if t.get("timer") == "start":
+                self.emit("if not analyzer.exercise_start_time:", 2)
+                self.emit("analyzer.exercise_start_time = analyzer.current_time()", 3)
+            elif t.get("timer") == "stop":
+                self.emit("analyzer.exercise_start_time = None", 2)
+            if t.get("count"):
+                self.emit("analyzer.rep_count += 1", 2)
+                self.emit("analyzer.check_completion()", 2)
+                self.emit("analyzer.record_rep(rep_quality, messages)", 2)
+            if message is not None:
+                if message_when is not None:
+                    self.emit(f"if {message_when}:", 2)
+                    self.emit(f"messages.append({message})", 3)
+                else:
+                    self.emit(f"messages.append({message})", 2)
+        if any(t.get("timer") for t in transitions):
+            self.emit("hold_time = (analyzer.current_time() - analyzer.exercise_start_time) "
+                      "if analyzer.exercise_start_time else 0")
+        else:
+            self.emit("hold_time = 0")
+
+
+def _angle_point(point, points: Dict[str, int], where: str) -> Tuple[int, Tuple[float, float]]:
+    if isinstance(point, str) and point in points:
+        return points[point], (0.0, 0.0)
+    if isinstance(point, dict) and point.get("point") in points:
+        dx, dy = point.get("offset", (0.0, 0.0))
+        return points[point["point"]], (float(dx), float(dy))
+    raise SpecError(f"{where}: unknown angle point {point!r}")
+
+
+def compile_angles(angles: Dict, points: Dict[str, int], calculate_angles: Callable, where: str) -> Callable:
+    """One gather + one vectorized angle computation for every angle in the spec."""
+    if not angles:
+        return lambda pts: np.empty(pts.shape[:-2] + (0,))
+    indices, offsets = [], []
+    for name, triplet in angles.items():
+        if not isinstance(triplet, list) or len(triplet) != 3:
+            raise SpecError(f"{where}.angles.{name}: expected [a, b, c]")
+        resolved = [_angle_point(p, points, f"{where}.angles.{name}") for p in triplet]
+        indices.append([i for i, _ in resolved])
+        offsets.append([o for _, o in resolved])
+    index = np.array(indices)
+    offset = np.array(offsets)
+    shifted = [bool(offset[:, k].any()) for k in range(3)]
+
+    def angles_of(pts: np.ndarray) -> np.ndarray:
+        abc = pts[..., index, :]
+        a, b, c = (abc[..., k, :] + offset[:, k] if shifted[k] else abc[..., k, :] for k in range(3))
+        return calculate_angles(a, b, c)
+
+    return angles_of
+
+
+def compile_spec(spec: Dict, points: Dict[str, int], midpoints: Dict[str, Tuple[int, int]], context: Dict,
+                 name: Optional[str] = None) -> CompiledSpec:
+    """
+    Compile a spec dict.
+
+    Args:
+        spec: Parsed spec (see the module header)
+        points: Point name -> index into body_points() (landmarks and midpoints)
+        midpoints: Midpoint name -> the two landmark indices it averages
+        context: Helpers the generated code calls: body_points, calculate_angles, feedback (PostureFeedback)
+        name: Label for error messages (defaults to the spec's exercise)
+    """
+    name = name or spec.get("exercise", "<spec>")
+    for key in ("exercise", "default_message"):
+        if key not in spec:
+            raise SpecError(f"{name}: missing '{key}'")
+    graph = FeatureGraph(spec, points, midpoints, name)
+    source = _Compiler(spec, graph, name).compile()
+    angles = compile_angles(spec.get("angles", {}), points, context["calculate_angles"], name)
+    namespace = {
+        "__builtins__": {"abs": abs, "min": min, "max": max, "len": len, "list": list, "getattr": getattr,
+                         "set": set, "sorted": sorted, "tuple": tuple},
+        "_Feedback": context["feedback"],
+        "_body_points": context["body_points"],
+        "_angles": angles,
+        "_visibility": _visibility,
+        "_steady": _steady,
+    }
+    exec(compile(source, f"<spec {name}>", "exec"), namespace)
+    return CompiledSpec(spec["exercise"], namespace["evaluate"], angles, graph.angle_names, list(spec.get("history", [])),
+                        spec.get("tempo"), graph, source)
+
+
+class RuleBook:
+    """Compiled specs by exercise name, reloaded from `directory` when the files change."""
+
+    def __init__(self, directory: str, points: Dict[str, int], midpoints: Dict[str, Tuple[int, int]], context: Dict,
+                 reload_interval: float = SPEC_RELOAD_INTERVAL):
+        self.directory = directory
+        self.points = points
+        self.midpoints = midpoints
+        self.context = context
+        self.reload_interval = reload_interval
+        self.specs: Dict[str, CompiledSpec] = {}
+        self.errors: Dict[str, str] = {}
+        self._failed: Dict[str, float] = {}  # path -> mtime of the version that failed to compile
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self.reload()
+
+    def poll(self):
+        """Check for changed spec files, at most every reload_interval seconds."""
+        if self.reload_interval and time.monotonic() - self._checked > self.reload_interval:
+            self.reload()
+
+    def get(self, exercise) -> Optional[CompiledSpec]:
+        """Compiled spec for an Exercise (or its name)."""
+        self.poll()
+        return self.specs.get(getattr(exercise, "name", exercise))
+
+    def __contains__(self, exercise) -> bool:
+        return getattr(exercise, "name", exercise) in self.specs
+
+    def reload(self) -> Dict[str, str]:
+        """Recompile new/changed spec files. A broken file keeps its last good version. Returns path -> status."""
+        with self._lock:
+            self._checked = time.monotonic()
+            status: Dict[str, str] = {}
+            try:
+                files = sorted(f for f in os.listdir(self.directory) if f.endswith(".json"))
+            except OSError as e:
+                logger.error(f"운동 스펙 디렉터리를 읽을 수 없음: {self.directory} ({e})")
+                return status
+            loaded = {spec.path: spec for spec in self.specs.values()}
+            for filename in files:
+                path = os.path.join(self.directory, filename)
+                mtime = os.path.getmtime(path)
+                if (path in loaded and loaded[path].mtime == mtime) or self._failed.get(path) == mtime:
+                    status[path] = "unchanged"
+                    continue
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        spec = json.load(f)
+                    compiled = compile_spec(spec, self.points, self.midpoints, self.context, name=filename)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    self.errors[path] = str(e)
+                    self._failed[path] = mtime
+                    status[path] = f"error: {e}"
+                    logger.error(f"운동 스펙 컴파일 실패 (이전 버전 유지): {path}: {e}")
+                    continue
+                compiled.path, compiled.mtime = path, mtime
+                previous = self.specs.get(compiled.exercise)
+                self.specs[compiled.exercise] = compiled
+                if previous is not None:
+                    previous.replaced = True
+                self.errors.pop(path, None)
+                self._failed.pop(path, None)
+                status[path] = "loaded"
+                if path in loaded:
+                    logger.info(f"운동 스펙 다시 불러옴: {compiled.exercise} ({filename})")
+            return status
+
+    def stats(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "exercises": sorted(self.specs),
+            "errors": dict(self.errors),
+        }
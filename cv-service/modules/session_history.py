@@ -0,0 +1,203 @@
+# cv-service/modules/session_history.py
+
+# What it does: Keeps a fixed-size history per session - recent per-frame features and one compact record per rep
+# Think of it as: The trainer's notepad with a fixed number of lines - old lines get overwritten, the totals are kept
+# Memory per session stays constant however long the workout runs
+
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+FRAME_HISTORY_SIZE = int(os.getenv("FRAME_HISTORY_SIZE", "256"))  # frames kept per session (~8 s at 30 fps)
+REP_HISTORY_SIZE = int(os.getenv("REP_HISTORY_SIZE", "100"))  # rep records kept per session; totals cover every rep
+MAX_REP_ERRORS = 4  # error messages stored per rep record (running error counts see all of them)
+
+# Message ids are stored as u2 in rep records; the top value is the "table full" sentinel
+OVERFLOW_MESSAGE_ID = np.iinfo(np.uint16).max
+OVERFLOW_MESSAGE = "(메시지 테이블 가득 참)"
+MESSAGE_TABLE_SIZE = min(int(os.getenv("MESSAGE_TABLE_SIZE", str(OVERFLOW_MESSAGE_ID))), OVERFLOW_MESSAGE_ID)
+
+
+class FrameHistory:
+    """
+    Ring buffer of (timestamp, feature vector) for the last `capacity` analyzed frames.
+
+    The tracked features come from the exercise spec's "history" list; configure() switches
+    the columns when the exercise changes. Reads return chronological copies.
+    """
+
+    def __init__(self, names: Sequence[str] = (), capacity: int = FRAME_HISTORY_SIZE):
+        self.capacity = max(1, capacity)
+        self.names: Tuple[str, ...] = ()
+        self.configure(names)
+
+    def configure(self, names: Sequence[str]):
+        """Track `names` (one column each). Changing the columns clears the history."""
+        names = tuple(names)
+        if names == self.names and hasattr(self, "values"):
+            return
+        self.names = names
+        self._columns = {name: k for k, name in enumerate(names)}
+        self.times = np.zeros(self.capacity)
+        self.values = np.zeros((self.capacity, len(names)))
+        self.clear()
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, values: Sequence[float]):
+        i = self._next
+        self.times[i] = timestamp
+        self.values[i] = values
+        self._next = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def last(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(times (n,), values (n, columns)) of the last n frames (default all kept), oldest first."""
+        n = self._count if n is None else max(0, min(n, self._count))
+        order = (np.arange(self._next - n, self._next)) % self.capacity
+        return self.times[order], self.values[order]
+
+    def column(self, name: str, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(times, values) of one tracked feature over the last n frames."""
+        times, values = self.last(n)
+        return times, values[:, self._columns[name]]
+
+
+class MessageTable:
+    """
+    Interns feedback messages as small ints so rep records don't hold string copies.
+
+    Process-wide and never pruned, so it is capped at `max_size` distinct messages; once full,
+    new messages get OVERFLOW_MESSAGE_ID (read back as OVERFLOW_MESSAGE). Specs produce a small,
+    fixed set of messages - reaching the cap means something formats unbounded text into them.
+    """
+
+    def __init__(self, max_size: int = MESSAGE_TABLE_SIZE):
+        self.max_size = max(0, min(max_size, OVERFLOW_MESSAGE_ID))
+        self._ids: Dict[str, int] = {}
+        self._messages: List[str] = []
+        self._lock = threading.Lock()
+
+    def id(self, message: str) -> int:
+        found = self._ids.get(message)
+        if found is not None:
+            return found
+        with self._lock:
+            if message not in self._ids:
+                if len(self._messages) >= self.max_size:
+                    return OVERFLOW_MESSAGE_ID
+                self._ids[message] = len(self._messages)
+                self._messages.append(message)
+            return self._ids[message]
+
+    def message(self, message_id: int) -> str:
+        return OVERFLOW_MESSAGE if message_id == OVERFLOW_MESSAGE_ID else self._messages[message_id]
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+class RepStore:
+    """
+    One fixed-size record per completed rep (the last `capacity` are kept) plus
+    running totals - rep count, quality sum and error counts - over every rep.
+    Error messages are stored as ids in `table` (the process-wide `messages` by default).
+    """
+
+    DTYPE = np.dtype([
+        ("rep", "i4"),
+        ("time", "f8"),
+        ("quality", "f8"),
+        ("n_errors", "u1"),
+        ("errors", "u2", (MAX_REP_ERRORS,)),
+        ("eccentric", "f4"),  # seconds; NaN when the exercise has no tempo
+        ("concentric", "f4"),
+        ("peak_velocity", "f4"),
+    ])
+
+    def __init__(self, capacity: int = REP_HISTORY_SIZE, table: Optional[MessageTable] = None):
+        self.capacity = max(1, capacity)
+        self.table = messages if table is None else table
+        self._records = np.zeros(self.capacity, dtype=self.DTYPE)
+        self.clear()
+
+    def clear(self):
+        self.total = 0  # reps recorded since the last clear (records beyond capacity are overwritten)
+        self.quality_sum = 0.0
+        self.error_counts: Dict[str, int] = {}
+        self.tempo_reps = 0
+        self.tempo_sum = [0.0, 0.0]  # eccentric, concentric
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def record(self, rep: int, quality: float, errors: Sequence[str], timestamp: float = 0.0, tempo=None):
+        """Add a rep; `tempo` is a kinematics.RepTempo or None."""
+        record = self._records[self.total % self.capacity]
+        ids = [self.table.id(e) for e in errors[:MAX_REP_ERRORS]]
+        record["rep"] = rep
+        record["time"] = timestamp
+        record["quality"] = quality
+        record["n_errors"] = len(ids)
+        record["errors"][:len(ids)] = ids
+        if tempo is not None:
+            record["eccentric"], record["concentric"] = tempo.eccentric, tempo.concentric
+            record["peak_velocity"] = tempo.peak_velocity
+            self.tempo_reps += 1
+            self.tempo_sum[0] += tempo.eccentric
+            self.tempo_sum[1] += tempo.concentric
+        else:
+            record["eccentric"] = record["concentric"] = record["peak_velocity"] = np.nan
+        self.total += 1
+        self.quality_sum += quality
+        for error in errors:
+            self.error_counts[error] = self.error_counts.get(error, 0) + 1
+
+    @property
+    def average_quality(self) -> float:
+        return self.quality_sum / self.total if self.total else 1.0
+
+    @property
+    def last_time(self) -> Optional[float]:
+        """Time of the most recent rep, or None before the first one."""
+        return float(self._records[(self.total - 1) % self.capacity]["time"]) if self.total else None
+
+    def average_tempo(self) -> Optional[Dict[str, float]]:
+        if not self.tempo_reps:
+            return None
+        return {"eccentric": self.tempo_sum[0] / self.tempo_reps, "concentric": self.tempo_sum[1] / self.tempo_reps}
+
+    def common_errors(self, k: int = 3) -> List[str]:
+        """Most frequent errors over every rep (ties keep first-seen order)."""
+        return [error for error, _ in sorted(self.error_counts.items(), key=lambda x: x[1], reverse=True)[:k]]
+
+    def records(self, since: int = 0) -> List[Dict]:
+        """
+        Kept records with index >= `since` (0-based over all reps recorded) as dicts:
+        rep, time, quality, errors, eccentric / concentric / peak_velocity (None without tempo).
+        """
+        start = max(since, self.total - self.capacity)
+        result = []
+        for index in range(start, self.total):
+            record = self._records[index % self.capacity]
+            result.append({
+                "rep": int(record["rep"]),
+                "time": float(record["time"]),
+                "quality": float(record["quality"]),
+                "errors": [self.table.message(int(e)) for e in record["errors"][:record["n_errors"]]],
+                **{key: None if np.isnan(record[key]) else round(float(record[key]), 3)
+                   for key in ("eccentric", "concentric", "peak_velocity")},
+            })
+        return result
+
+
+messages = MessageTable()
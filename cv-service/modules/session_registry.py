@@ -0,0 +1,125 @@
+# cv-service/modules/session_registry.py
+
+# What it does: Keeps one analysis state per connected client (rep count, smoothing, exercise state)
+# Think of it as: A coat check - every client gets their own ticket and their own hanger
+# Sessions outlive a dropped connection for a while so clients can reconnect with the same id
+
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+DEFAULT_SESSION_TTL = float(os.getenv("LIVE_SESSION_TTL", "300"))  # seconds a detached session is kept
+DEFAULT_MAX_SESSIONS = int(os.getenv("LIVE_SESSION_MAX", "1000"))
+
+
+class SessionLimitReached(RuntimeError):
+    """Raised when the registry is full of live (attached) sessions."""
+
+
+@dataclass
+class LiveSession:
+    session_id: str
+    state: Any
+    exercise: Any = None
+    attached: bool = True
+    created_at: float = field(default_factory=time.monotonic)
+    last_seen: float = field(default_factory=time.monotonic)
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+
+class SessionRegistry:
+    """Session store keyed by connection or client-supplied session id, with TTL eviction."""
+
+    def __init__(self, state_factory: Callable[[], Any], ttl: float = DEFAULT_SESSION_TTL,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.state_factory = state_factory
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: Dict[str, LiveSession] = {}
+        self._lock = threading.Lock()
+
+    def open(self, session_id: Optional[str] = None) -> Tuple[LiveSession, bool]:
+        """
+        Attach a connection to a session.
+
+        Resumes the detached session with the given id if it is still alive,
+        otherwise creates a new one.
+
+        Returns:
+            (session, resumed)
+        """
+        with self._lock:
+            self._evict_expired_locked(time.monotonic())
+
+            session = self._sessions.get(session_id) if session_id else None
+            if session is not None and not session.attached:
+                session.attached = True
+                session.touch()
+                return session, True
+
+            if len(self._sessions) >= self.max_sessions:
+                self._evict_oldest_detached_locked()
+                if len(self._sessions) >= self.max_sessions:
+                    raise SessionLimitReached(f"Too many live sessions ({self.max_sessions})")
+
+            # Unknown id, or the id is in use by another live connection -> fresh session
+            new_id = session_id if session_id and session_id not in self._sessions else uuid.uuid4().hex
+            session = LiveSession(session_id=new_id, state=self.state_factory())
+            self._sessions[new_id] = session
+            return session, False
+
+    def detach(self, session: LiveSession):
+        """Mark a session as disconnected. It is kept for `ttl` seconds for reconnects."""
+        with self._lock:
+            session.attached = False
+            session.touch()
+            self._evict_expired_locked(time.monotonic())
+
+    def discard(self, session: LiveSession):
+        """Drop a session immediately."""
+        with self._lock:
+            self._sessions.pop(session.session_id, None)
+
+    def get(self, session_id: str) -> Optional[LiveSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def evict_expired(self) -> int:
+        """Remove detached sessions idle for longer than the TTL. Returns how many were removed."""
+        with self._lock:
+            return self._evict_expired_locked(time.monotonic())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            attached = sum(1 for s in self._sessions.values() if s.attached)
+            return {
+                "total": len(self._sessions),
+                "attached": attached,
+                "detached": len(self._sessions) - attached,
+                "ttl": self.ttl,
+                "max_sessions": self.max_sessions,
+            }
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict_expired_locked(self, now: float) -> int:
+        expired = [
+            sid for sid, s in self._sessions.items()
+            if not s.attached and now - s.last_seen > self.ttl
+        ]
+        for sid in expired:
+            del self._sessions[sid]
+        return len(expired)
+
+    def _evict_oldest_detached_locked(self):
+        detached = [s for s in self._sessions.values() if not s.attached]
+        if detached:
+            oldest = min(detached, key=lambda s: s.last_seen)
+            del self._sessions[oldest.session_id]
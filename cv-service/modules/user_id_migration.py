@@ -0,0 +1,154 @@
+# cv-service/modules/user_id_migration.py
+
+# What it does: Rewrites string user_ids ("12") in routines/users to the canonical integer (12), in throttled batches
+# Think of it as: Re-labelling old binders with the new member-number format, one shelf at a time
+# Resumable - converted documents drop out of the query, so re-running picks up where the last run stopped
+#
+# CLI (from cv-service/, uses MONGO_URL / MONGO_DB):
+#   python -m modules.user_id_migration --dry-run
+#   python -m modules.user_id_migration --batch-size 500 --pause 0.1 [--enforce]
+#
+# --enforce adds a $jsonSchema validator (user_id must be int/long) once a collection has no
+# non-integer user_ids left, so no writer can bring the mixed types back.
+
+import argparse
+import asyncio
+import os
+import sys
+from dataclasses import dataclass
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from .workout_routine_api import MONGO_URL, MONGO_DB
+
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "500"))
+MIGRATION_PAUSE = float(os.getenv("MIGRATION_PAUSE", "0.1"))  # seconds between batches, keeps load off the primary
+COLLECTIONS = ("routines", "users")
+
+# Documents still to migrate (default templates have no user_id and are left alone)
+NON_CANONICAL = {"user_id": {"$exists": True}, "$nor": [{"user_id": {"$type": "int"}}, {"user_id": {"$type": "long"}}]}
+USER_ID_VALIDATOR = {"$jsonSchema": {"properties": {"user_id": {"bsonType": ["int", "long"]}}}}
+
+
+def canonical_user_id(value) -> Optional[int]:
+    """int, digit string or integral double -> int; None if the value can't be a user id."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    return None
+
+
+@dataclass
+class MigrationStats:
+    collection: str
+    scanned: int = 0
+    converted: int = 0
+    skipped: int = 0  # values that aren't a user id (null, "abc", ...) - left for manual cleanup
+    conflicts: int = 0  # conversions rejected by a unique index (same user/day stored as both "12" and 12)
+    enforced: bool = False
+
+
+async def migrate_collection(db, name: str, batch_size: int = MIGRATION_BATCH_SIZE,
+                             pause: float = MIGRATION_PAUSE, dry_run: bool = False) -> MigrationStats:
+    """Convert one collection's user_ids batch by batch (ordered by _id)."""
+    stats = MigrationStats(name)
+    collection = db[name]
+    last_id = None
+    while True:
+        query = dict(NON_CANONICAL)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, {"user_id": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        stats.scanned += len(batch)
+
+        operations = []
+        for document in batch:
+            value = canonical_user_id(document["user_id"])
+            if value is None:
+                stats.skipped += 1
+                print(f"{name} {document['_id']}: user_id {document['user_id']!r} is not a user id, skipped")
+                continue
+            # Matching the old value too makes each write a compare-and-set against concurrent edits
+            operations.append(UpdateOne({"_id": document["_id"], "user_id": document["user_id"]},
+                                        {"$set": {"user_id": value}}))
+
+        if dry_run:
+            stats.converted += len(operations)
+        elif operations:
+            try:
+                result = await collection.bulk_write(operations, ordered=False)
+                stats.converted += result.modified_count
+            except BulkWriteError as e:
+                stats.converted += e.details.get("nModified", 0)
+                for error in e.details.get("writeErrors", []):
+                    stats.conflicts += 1
+                    print(f"{name}: {error.get('errmsg')}")
+        await asyncio.sleep(pause)
+    return stats
+
+
+async def enforce_user_id_type(db, name: str) -> bool:
+    """Add the int-only user_id validator if nothing non-canonical is left. Returns True if applied."""
+    if name not in await db.list_collection_names():
+        return False
+    if await db[name].count_documents(NON_CANONICAL, limit=1):
+        print(f"{name}: non-integer user_ids remain, validator not added")
+        return False
+    try:
+        await db.command("collMod", name, validator=USER_ID_VALIDATOR, validationLevel="strict")
+    except OperationFailure as e:
+        print(f"{name}: validator not added: {e}")
+        return False
+    return True
+
+
+async def migrate(db, batch_size: int = MIGRATION_BATCH_SIZE, pause: float = MIGRATION_PAUSE,
+                  dry_run: bool = False, enforce: bool = False) -> List[MigrationStats]:
+    results = []
+    for name in COLLECTIONS:
+        stats = await migrate_collection(db, name, batch_size, pause, dry_run)
+        if enforce and not dry_run:
+            stats.enforced = await enforce_user_id_type(db, name)
+        results.append(stats)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert string user_ids in routines/users to integers.")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE, help="Documents per bulk_write")
+    parser.add_argument("--pause", type=float, default=MIGRATION_PAUSE, help="Seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="Count what would change without writing")
+    parser.add_argument("--enforce", action="store_true",
+                        help="Afterwards, reject non-integer user_ids with a collection validator")
+    args = parser.parse_args(argv)
+
+    async def run():
+        client = AsyncIOMotorClient(MONGO_URL)
+        try:
+            return await migrate(client[MONGO_DB], max(1, args.batch_size), args.pause, args.dry_run, args.enforce)
+        finally:
+            client.close()
+
+    results = asyncio.run(run())
+
+    for stats in results:
+        verb = "would convert" if args.dry_run else "converted"
+        print(f"{stats.collection}: scanned {stats.scanned}, {verb} {stats.converted}, skipped {stats.skipped}, "
+              f"conflicts {stats.conflicts}{', validator added' if stats.enforced else ''}")
+    return 1 if any(s.skipped or s.conflicts for s in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
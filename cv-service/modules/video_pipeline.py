@@ -0,0 +1,379 @@
+# cv-service/modules/video_pipeline.py
+
+# What it does: Analyzes recorded workout videos offline (no display window) and produces a rep report
+# Think of it as: A coach fast-forwarding through a session tape with a clipboard
+# Decode -> inference -> analysis -> (optional) annotate/encode run as threads joined by bounded queues
+#
+# CLI (from cv-service/):
+#   python -m modules.video_pipeline squat.mp4 --exercise 스쿼트 --stride 2 --resolution 640x480 \
+#       --json report.json --csv reps.csv [--annotate annotated.mp4] [--workers 2]
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import cv2
+
+from .exercise_analyzer import ExerciseAnalyzer, Exercise, PostureFeedback, draw_pose
+from .pose_model_pool import PoseModelPool, pose_model_pool
+
+
+VIDEO_FRAME_STRIDE = int(os.getenv("VIDEO_FRAME_STRIDE", "2"))  # analyze every Nth frame
+VIDEO_RESOLUTION = os.getenv("VIDEO_RESOLUTION", "640x480")  # "WxH" or "native"
+VIDEO_QUEUE_SIZE = int(os.getenv("VIDEO_QUEUE_SIZE", "8"))  # frames buffered between two stages
+VIDEO_INFERENCE_WORKERS = int(os.getenv("VIDEO_INFERENCE_WORKERS", "1"))
+
+_DONE = object()  # end-of-stream marker passed down the queues
+
+
+@dataclass
+class RepRecord:
+    rep: int
+    frame: int
+    time_sec: float
+    quality: float
+    errors: List[str]
+    eccentric: Optional[float] = None  # seconds (None when the exercise has no tempo)
+    concentric: Optional[float] = None
+    peak_velocity: Optional[float] = None  # degrees (or spec units) per second
+
+
+@dataclass
+class VideoAnalysisReport:
+    source: str
+    exercise: str
+    target_reps: Optional[int]
+    completed: bool
+    frame_stride: int
+    resolution: Optional[Tuple[int, int]]
+    source_fps: float
+    frames_read: int = 0
+    frames_analyzed: int = 0
+    frames_with_pose: int = 0
+    video_seconds: float = 0.0
+    processing_seconds: float = 0.0
+    realtime_factor: float = 0.0  # video seconds processed per wall-clock second
+    total_reps: int = 0
+    average_quality: float = 1.0
+    common_errors: List[str] = field(default_factory=list)
+    max_hold_time: float = 0.0  # time-based exercises (plank)
+    reps: List[RepRecord] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def parse_resolution(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """'640x480' -> (640, 480); 'native' / '' / None -> None (keep the source size)."""
+    if not value or value == "native":
+        return None
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def parse_exercise(value: str) -> Exercise:
+    """Accept the Korean name (스쿼트) or the enum name (SQUAT)."""
+    try:
+        return Exercise(value)
+    except ValueError:
+        return Exercise[value.upper()]
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is stopping (so no stage deadlocks)."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def analyze_video(source: Union[str, int], exercise: Exercise, target_reps: Optional[int] = None,
+                  stride: int = VIDEO_FRAME_STRIDE, resolution: Optional[Tuple[int, int]] = parse_resolution(VIDEO_RESOLUTION),
+                  workers: int = VIDEO_INFERENCE_WORKERS, queue_size: int = VIDEO_QUEUE_SIZE,
+                  annotate_path: Optional[str] = None, stop_on_complete: bool = False,
+                  pool: PoseModelPool = pose_model_pool, analyzer: Optional[ExerciseAnalyzer] = None,
+                  on_feedback: Optional[Callable[[int, PostureFeedback], None]] = None) -> VideoAnalysisReport:
+    """
+    Stream a video through decode -> inference -> analysis (-> annotate/encode) and report reps.
+
+    Args:
+        source: Video file path (or camera index)
+        exercise: Exercise type
+        target_reps: Optional target; `completed` in the report says if it was reached
+        stride: Analyze every `stride`-th frame (skipped frames are grabbed, never decoded)
+        resolution: (width, height) to resize to before inference, or None for the source size
+        workers: Parallel inference threads, each with its own detector from `pool`
+                 (a VIDEO-mode pool tracks the pose frame to frame, so it always uses one thread)
+        queue_size: Frames buffered between stages (bounds memory)
+        annotate_path: Write an annotated video (mp4v) of the analyzed frames here
+        stop_on_complete: Stop reading once `target_reps` is reached
+        on_feedback: Called as on_feedback(frame_index, feedback) for every analyzed frame
+    """
+    stride = max(1, stride)
+    video_mode = pool.running_mode == "video"
+    workers = 1 if video_mode else max(1, workers)
+    analyzer = analyzer or ExerciseAnalyzer()
+    analyzer.set_exercise(exercise)
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source: {source}")
+
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    report = VideoAnalysisReport(
+        source=str(source),
+        exercise=exercise.value,
+        target_reps=target_reps,
+        completed=False,
+        frame_stride=stride,
+        resolution=resolution,
+        source_fps=source_fps,
+    )
+
+    completed = threading.Event()
+    analyzer.set_target_reps(target_reps, completed.set)
+
+    halt = threading.Event()  # stop reading new frames (target reached); in-flight frames still drain
+    stop = threading.Event()  # abort every stage (a stage failed)
+    errors: List[BaseException] = []
+    decoded_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    detected_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    annotate_q: Optional[queue.Queue] = queue.Queue(maxsize=queue_size) if annotate_path else None
+
+    def fail(e: BaseException):
+        errors.append(e)
+        stop.set()
+
+    # 1. Decode: grab() skips frames without decoding them
+    def decode_stage():
+        start = time.monotonic()
+        frame_index = 0
+        seq = 0
+        try:
+            while not stop.is_set() and not halt.is_set():
+                if frame_index % stride:
+                    if not cap.grab():
+                        break
+                    frame_index += 1
+                    continue
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if resolution is not None:
+                    frame = cv2.resize(frame, resolution)
+                timestamp = frame_index / source_fps if source_fps > 0 else time.monotonic() - start
+                if not _put(decoded_q, (seq, frame_index, timestamp, frame), stop):
+                    break
+                seq += 1
+                frame_index += 1
+        except Exception as e:
+            fail(e)
+        finally:
+            report.frames_read = frame_index
+            _put(decoded_q, _DONE, stop)
+
+    # 2. Inference: IMAGE-mode detection is stateless, so frames can be spread over workers;
+    #    VIDEO mode runs on one worker and is fed the frame's own timestamp
+    finished_workers = [0]
+    finished_lock = threading.Lock()
+
+    def inference_stage():
+        try:
+            with pool.checkout() as detector:
+                while True:
+                    item = _get(decoded_q, stop)
+                    if item is _DONE:
+                        _put(decoded_q, _DONE, stop)  # let the other workers see it too
+                        break
+                    seq, frame_index, timestamp, frame = item
+                    timestamp_ms = int(timestamp * 1000) if video_mode else None
+                    landmarks = analyzer.detect_landmarks(frame, detector, timestamp_ms)
+                    if not _put(detected_q, (seq, frame_index, timestamp, frame, landmarks), stop):
+                        break
+        except Exception as e:
+            fail(e)
+        finally:
+            with finished_lock:
+                finished_workers[0] += 1
+                last = finished_workers[0] == workers
+            if last:
+                _put(detected_q, _DONE, stop)
+
+    # 4. Annotate + encode (optional)
+    def annotate_stage():
+        writer = None
+        try:
+            while True:
+                item = _get(annotate_q, stop)
+                if item is _DONE:
+                    break
+                frame, landmarks, feedback, rep_count = item
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    out_fps = (source_fps / stride) if source_fps > 0 else 15.0
+                    writer = cv2.VideoWriter(annotate_path, cv2.VideoWriter_fourcc(*"mp4v"), out_fps, (width, height))
+                writer.write(draw_pose(frame, landmarks, feedback, rep_count))
+        except Exception as e:
+            fail(e)
+        finally:
+            if writer is not None:
+                writer.release()
+
+    threads = [threading.Thread(target=decode_stage, name="video-decode", daemon=True)]
+    threads += [threading.Thread(target=inference_stage, name=f"video-inference-{i}", daemon=True) for i in range(workers)]
+    if annotate_q is not None:
+        threads.append(threading.Thread(target=annotate_stage, name="video-annotate", daemon=True))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    # 3. Analysis (this thread): restore frame order, then run the stateful analyzer
+    pending: Dict[int, tuple] = {}
+    next_seq = 0
+    try:
+        while True:
+            item = _get(detected_q, stop)
+            if item is _DONE:
+                break
+            pending[item[0]] = item
+            while next_seq in pending:
+                _, frame_index, timestamp, frame, landmarks = pending.pop(next_seq)
+                next_seq += 1
+                report.frames_analyzed += 1
+
+                feedback = None
+                if landmarks is not None:
+                    report.frames_with_pose += 1
+                    reps_before = analyzer.reps.total
+                    feedback = analyzer.analyze_pose(landmarks, exercise, timestamp)
+                    for entry in analyzer.reps.records(reps_before):
+                        report.reps.append(RepRecord(
+                            rep=entry['rep'],
+                            frame=frame_index,
+                            time_sec=round(timestamp, 3),
+                            quality=entry['quality'],
+                            errors=list(entry['errors']),
+                            eccentric=entry['eccentric'],
+                            concentric=entry['concentric'],
+                            peak_velocity=entry['peak_velocity']
+                        ))
+                    if feedback is not None:
+                        report.max_hold_time = max(report.max_hold_time, float(feedback.angle_data.get("hold_time", 0.0)))
+                        if on_feedback:
+                            on_feedback(frame_index, feedback)
+
+                if annotate_q is not None:
+                    _put(annotate_q, (frame, landmarks, feedback, analyzer.rep_count), stop)
+
+                if stop_on_complete and completed.is_set():
+                    halt.set()
+    except Exception as e:
+        fail(e)
+    finally:
+        if annotate_q is not None:
+            _put(annotate_q, _DONE, stop)
+        for thread in threads:
+            thread.join()
+        cap.release()
+
+    if errors:
+        raise errors[0]
+
+    summary = analyzer.get_form_summary()
+    report.completed = completed.is_set()
+    report.total_reps = analyzer.rep_count
+    report.average_quality = summary["average_quality"]
+    report.common_errors = summary["common_errors"]
+    report.processing_seconds = round(time.perf_counter() - started, 3)
+    if source_fps > 0:
+        report.video_seconds = round(report.frames_read / source_fps, 3)
+    if report.processing_seconds > 0:
+        report.realtime_factor = round(report.video_seconds / report.processing_seconds, 2)
+    return report
+
+
+def write_report_json(report: VideoAnalysisReport, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+def write_report_csv(report: VideoAnalysisReport, path: str):
+    """One row per completed rep (tempo cells are empty for exercises without a tempo)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rep", "frame", "time_sec", "quality", "errors", "eccentric", "concentric", "peak_velocity"])
+        for rep in report.reps:
+            tempo = ["" if value is None else value for value in (rep.eccentric, rep.concentric, rep.peak_velocity)]
+            writer.writerow([rep.rep, rep.frame, rep.time_sec, round(rep.quality, 3), " | ".join(rep.errors), *tempo])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyze a recorded workout video and write a rep report.")
+    parser.add_argument("video", help="Video file path")
+    parser.add_argument("--exercise", required=True, help="Exercise name, e.g. 스쿼트 or SQUAT")
+    parser.add_argument("--target-reps", type=int, default=None)
+    parser.add_argument("--stride", type=int, default=VIDEO_FRAME_STRIDE, help="Analyze every Nth frame")
+    parser.add_argument("--resolution", default=VIDEO_RESOLUTION, help="WxH before inference, or 'native'")
+    parser.add_argument("--running-mode", choices=["video", "image"], default="video",
+                        help="video: track the pose between frames (one thread); image: detect every frame (--workers threads)")
+    parser.add_argument("--workers", type=int, default=VIDEO_INFERENCE_WORKERS, help="Parallel inference threads (image mode)")
+    parser.add_argument("--queue-size", type=int, default=VIDEO_QUEUE_SIZE)
+    parser.add_argument("--model", default=None, help="Pose model path (defaults to POSE_MODEL_PATH)")
+    parser.add_argument("--json", dest="json_path", help="Write the full report as JSON")
+    parser.add_argument("--csv", dest="csv_path", help="Write one row per rep as CSV")
+    parser.add_argument("--annotate", dest="annotate_path", help="Write an annotated video (mp4)")
+    args = parser.parse_args(argv)
+
+    # A private pool sized to the worker count, so every inference thread has its own detector
+    pool = PoseModelPool(model_path=args.model or pose_model_pool.model_path, max_size=args.workers,
+                         running_mode=args.running_mode)
+    try:
+        report = analyze_video(
+            args.video,
+            parse_exercise(args.exercise),
+            target_reps=args.target_reps,
+            stride=args.stride,
+            resolution=parse_resolution(args.resolution),
+            workers=args.workers,
+            queue_size=args.queue_size,
+            annotate_path=args.annotate_path,
+            pool=pool,
+        )
+    finally:
+        pool.close()
+
+    if args.json_path:
+        write_report_json(report, args.json_path)
+    if args.csv_path:
+        write_report_csv(report, args.csv_path)
+
+    print(f"{report.exercise}: {report.total_reps} reps, average quality {report.average_quality:.0%}")
+    print(f"{report.frames_analyzed} frames analyzed ({report.frames_with_pose} with a pose) "
+          f"in {report.processing_seconds}s - {report.realtime_factor}x real time")
+    if report.common_errors:
+        print(f"Common errors: {', '.join(report.common_errors)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,10 +5,16 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from bson import ObjectId
+from pymongo import ReturnDocument
 import os
+import asyncio
 from datetime import datetime
 from typing import Union
 
+from .metrics import MongoCommandListener
+from .mongo_indexes import prepare_indexes, MONGO_EXPLAIN_CHECK
+from .routine_cache import routine_cache
+
 router = APIRouter(prefix="/api/workout", tags=["workout"])
 
 # MongoDB connection
@@ -18,6 +24,7 @@ MONGO_DB = os.getenv("MONGO_DB", "test")
 class MongoDB:
     client: AsyncIOMotorClient = None
     db: AsyncIOMotorDatabase = None
+    index_task: Optional[asyncio.Task] = None
 
 mongodb = MongoDB()
 
@@ -26,11 +33,27 @@ async def get_database() -> AsyncIOMotorDatabase:
 
 # MongoDB connection lifecycle
 async def connect_to_mongo():
-    mongodb.client = AsyncIOMotorClient(MONGO_URL)
+    if MONGO_URL.startswith("mongomock://"):
+        # In-memory stand-in for local load tests (pip install mongomock-motor)
+        from mongomock_motor import AsyncMongoMockClient
+        mongodb.client = AsyncMongoMockClient()
+    else:
+        # Command latencies show up on /metrics (cv_mongo_command_seconds)
+        mongodb.client = AsyncIOMotorClient(MONGO_URL, event_listeners=[MongoCommandListener()])
     mongodb.db = mongodb.client[MONGO_DB]
     print(f"Connected to MongoDB at {MONGO_URL}, DB: {mongodb.db.name}")
+    
+    # Indexes for the hot routine/user queries (see mongo_indexes.py). Built in the background so the
+    # pose/WebSocket endpoints come up even when MongoDB is down; only the opt-in explain check
+    # (UnindexedQueryError) is allowed to fail startup.
+    if MONGO_EXPLAIN_CHECK and not MONGO_URL.startswith("mongomock://"):
+        await prepare_indexes(mongodb.db, explain_check=True)
+    else:
+        mongodb.index_task = asyncio.create_task(prepare_indexes(mongodb.db))
 
 async def close_mongo_connection():
+    if mongodb.index_task and not mongodb.index_task.done():
+        mongodb.index_task.cancel()
     if mongodb.client:
         mongodb.client.close()
         print("Disconnected from MongoDB")
@@ -76,18 +99,18 @@ async def test_connection(db: AsyncIOMotorDatabase = Depends(get_database)):
         # Get collection names
         collections = await db.list_collection_names()
         
-        # Count documents in routines collection
-        count = await db.routines.count_documents({})
+        # Count documents in routines collection (collection metadata, no scan)
+        count = await db.routines.estimated_document_count()
         
-        # Get a sample routine
-        sample = await db.routines.find_one()
+        # Get a sample routine (day/title only)
+        sample = await db.routines.find_one({}, {"day": 1, "title": 1})
         
         return {
             "status": "connected",
             "database": db.name,
             "collections": collections,
             "routines_count": count,
-            "sample_routine": routine_helper(sample) if sample else None
+            "sample_routine": {**sample, "_id": str(sample["_id"])} if sample else None
         }
     except Exception as e:
         return {
@@ -101,15 +124,56 @@ async def get_all_routines(
     user_id: int = Query(...),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    user_id_str = str(user_id)
+    cached = routine_cache.get(user_id, "all")
+    if cached is not None:
+        return cached
+    generation = routine_cache.generation()
     routines = []
-    # Add .sort("day", 1) to ensure routines are ordered by day ascending
-    async for routine in db.routines.find(
-        {"user_id": {"$in": [user_id, user_id_str, int(user_id_str) if user_id_str.isdigit() else None]}}
-    ).sort("day", 1):
+    # user_id is always stored as an int (see user_id_migration.py), so this is one (user_id, day) index seek
+    async for routine in db.routines.find({"user_id": user_id}).sort("day", 1):
         routines.append(routine_helper(routine))
+    routine_cache.put(user_id, "all", routines, generation)
+    for routine in routines:
+        routine_cache.put(user_id, routine["day"], routine, generation)
     return routines
 
+# Per-day totals computed on the server - the nested exercises/sets never leave the database
+# ($size fails the whole aggregation on a missing/null array, so each input defaults to [])
+EXERCISES_OR_EMPTY = {"$ifNull": ["$exercises", []]}
+SETS_OR_EMPTY = {"$ifNull": ["$$e.sets", []]}  # inside a $map/$filter over exercises "as": "e"
+
+ROUTINE_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "day": 1,
+    "title": 1,
+    "exercise_count": {"$size": EXERCISES_OR_EMPTY},
+    "total_sets": {"$sum": {"$map": {"input": EXERCISES_OR_EMPTY, "as": "e", "in": {"$size": SETS_OR_EMPTY}}}},
+    "completed_sets": {"$sum": {"$map": {
+        "input": EXERCISES_OR_EMPTY,
+        "as": "e",
+        "in": {"$size": {"$filter": {"input": SETS_OR_EMPTY, "as": "s", "cond": {"$eq": ["$$s.completed", True]}}}}
+    }}}
+}
+
+# 루틴 요약 (일차별 제목 / 세트 수 / 완료 세트 수) - 루틴 목록 화면용
+@router.get("/routines/summary")
+async def get_routine_summaries(
+    user_id: int = Query(...),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    cached = routine_cache.get(user_id, "summary")
+    if cached is not None:
+        return cached
+    generation = routine_cache.generation()
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$sort": {"day": 1}},
+        {"$project": ROUTINE_SUMMARY_PROJECTION}
+    ]
+    summaries = await db.routines.aggregate(pipeline).to_list(None)
+    routine_cache.put(user_id, "summary", summaries, generation)
+    return summaries
+
 # 특정 날짜 루틴 조회 (user_id 기준)
 @router.get("/routines/{day}")
 async def get_routine_by_day(
@@ -117,10 +181,49 @@ async def get_routine_by_day(
     user_id: int = Query(...),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
+    cached = routine_cache.get(user_id, day)
+    if cached is not None:
+        return cached
+    generation = routine_cache.generation()
     routine = await db.routines.find_one({"day": day, "user_id": user_id})
     if not routine:
         raise HTTPException(status_code=404, detail=f"Routine for day {day} not found")
-    return routine_helper(routine)
+    routine = routine_helper(routine)
+    routine_cache.put(user_id, day, routine, generation)
+    return routine
+
+# Set/exercise mutations are single atomic updates addressed by id (arrayFilters / update pipelines),
+# so concurrent toggles from the frontend can't overwrite each other and only the changed fields travel.
+SET_FIELDS = ("reps", "weight", "time", "completed")
+DEFAULT_SET = {"id": 1, "reps": 10, "weight": 0, "completed": False}
+
+def routine_filter(day: int, user_id: int, exercise_id: Optional[int] = None, set_id: Optional[int] = None) -> dict:
+    """Query matching the routine only if it has the given exercise (and set)."""
+    query = {"day": day, "user_id": user_id}
+    if set_id is not None:
+        query["exercises"] = {"$elemMatch": {"id": exercise_id, "sets.id": set_id}}
+    elif exercise_id is not None:
+        query["exercises.id"] = exercise_id
+    return query
+
+def map_exercise(exercise_id: int, sets_expr) -> dict:
+    """Update-pipeline expression replacing the `sets` of one exercise with `sets_expr` ($$e is the exercise)."""
+    return {"$map": {
+        "input": "$exercises",
+        "as": "e",
+        "in": {"$cond": [
+            {"$eq": ["$$e.id", exercise_id]},
+            {"$mergeObjects": ["$$e", {"sets": sets_expr}]},
+            "$$e"
+        ]}
+    }}
+
+async def raise_not_found(db: AsyncIOMotorDatabase, day: int, user_id: int, detail: str):
+    """404 for a failed update - only the miss path pays for the extra lookup."""
+    routine_cache.invalidate(user_id, day)  # whatever is cached didn't match the database
+    if not await db.routines.count_documents({"day": day, "user_id": user_id}, limit=1):
+        raise HTTPException(status_code=404, detail=f"Routine for day {day} not found")
+    raise HTTPException(status_code=404, detail=detail)
 
 # FIXED: Separate endpoints for different operations
 @router.put("/routines/{day}/exercises/{exercise_id}/sets/{set_id}")
@@ -133,34 +236,23 @@ async def update_set(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update a specific set with new data"""
-    # Find the routine
-    routine = await db.routines.find_one({"day": day, "user_id": user_id})
-    if not routine:
-        raise HTTPException(status_code=404, detail=f"Routine for day {day} not found")
-    
-    # Update the specific set
-    updated = False
-    for exercise in routine["exercises"]:
-        if exercise["id"] == exercise_id:
-            for set_item in exercise["sets"]:
-                if set_item["id"] == set_id:
-                    # Update the set data
-                    for key, value in update_data.items():
-                        if key in set_item or key in ["reps", "weight", "time", "completed"]:
-                            set_item[key] = value
-                    updated = True
-                    break
-            if updated:
-                break
+    query = routine_filter(day, user_id, exercise_id, set_id)
+    changes = {f"exercises.$[e].sets.$[s].{key}": value for key, value in update_data.items() if key in SET_FIELDS}
     
-    if not updated:
-        raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} or Set {set_id} not found")
+    if not changes:
+        # Nothing to write - just confirm the set exists
+        if not await db.routines.count_documents(query, limit=1):
+            await raise_not_found(db, day, user_id, f"Exercise {exercise_id} or Set {set_id} not found")
+        return {"message": "Set updated successfully"}
     
-    # Save the updated routine
-    await db.routines.update_one(
-        {"day": day, "user_id": user_id},
-        {"$set": {"exercises": routine["exercises"]}}
+    result = await db.routines.update_one(
+        query,
+        {"$set": changes},
+        array_filters=[{"e.id": exercise_id}, {"s.id": set_id}]
     )
+    if result.matched_count == 0:
+        await raise_not_found(db, day, user_id, f"Exercise {exercise_id} or Set {set_id} not found")
+    routine_cache.invalidate(user_id, day)
     
     return {"message": "Set updated successfully"}
 
@@ -173,34 +265,27 @@ async def toggle_set_completion(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Toggle set completion status"""
-    routine = await db.routines.find_one({"day": day, "user_id": user_id})
-    if not routine:
-        raise HTTPException(status_code=404, detail=f"Routine for day {day} not found")
-    
-    toggled = False
-    current_status = None
-    for exercise in routine["exercises"]:
-        if exercise["id"] == exercise_id:
-            for set_item in exercise["sets"]:
-                if set_item["id"] == set_id:
-                    set_item["completed"] = not set_item.get("completed", False)
-                    current_status = set_item["completed"]
-                    toggled = True
-                    break
-            if toggled:
-                break
-    
-    if not toggled:
-        raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} or Set {set_id} not found")
-    
-    # Save the updated routine
-    result = await db.routines.update_one(
-        {"day": day, "user_id": user_id},
-        {"$set": {"exercises": routine["exercises"]}}
+    # Flipped on the server (update pipeline), so two quick toggles always cancel out
+    toggled_sets = {"$map": {
+        "input": "$$e.sets",
+        "as": "s",
+        "in": {"$cond": [
+            {"$eq": ["$$s.id", set_id]},
+            {"$mergeObjects": ["$$s", {"completed": {"$not": [{"$ifNull": ["$$s.completed", False]}]}}]},
+            "$$s"
+        ]}
+    }}
+    routine = await db.routines.find_one_and_update(
+        routine_filter(day, user_id, exercise_id, set_id),
+        [{"$set": {"exercises": map_exercise(exercise_id, toggled_sets)}}],
+        projection={"_id": 0, "exercises": {"$elemMatch": {"id": exercise_id}}},
+        return_document=ReturnDocument.AFTER
     )
+    if routine is None:
+        await raise_not_found(db, day, user_id, f"Exercise {exercise_id} or Set {set_id} not found")
     
-    if result.modified_count == 0:
-        raise HTTPException(status_code=500, detail="Failed to update routine in database")
+    routine_cache.update_exercise(user_id, day, routine["exercises"][0])
+    current_status = next(s["completed"] for s in routine["exercises"][0]["sets"] if s["id"] == set_id)
     
     return {
         "message": "Set completion toggled successfully", 
@@ -217,36 +302,26 @@ async def add_set(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Add a new set to an exercise"""
-    routine = await db.routines.find_one({"day": day, "user_id": user_id})
-    if not routine:
-        raise HTTPException(status_code=404, detail=f"Routine for day {day} not found")
-    
-    new_set = None
-    for exercise in routine["exercises"]:
-        if exercise["id"] == exercise_id:
-            # Create new set based on the last set
-            if exercise["sets"]:
-                last_set = exercise["sets"][-1]
-                new_set = last_set.copy()
-                new_set["id"] = max(s["id"] for s in exercise["sets"]) + 1
-                new_set["completed"] = False
-            else:
-                # Default set if no existing sets
-                new_set = {"id": 1, "reps": 10, "weight": 0, "completed": False}
-            
-            exercise["sets"].append(new_set)
-            break
-    
-    if not new_set:
-        raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} not found")
-    
-    # Save the updated routine
-    await db.routines.update_one(
-        {"day": day, "user_id": user_id},
-        {"$set": {"exercises": routine["exercises"]}}
+    # New set = copy of the last set with the next id, built on the server so concurrent adds get distinct ids
+    new_set = {"$cond": [
+        {"$gt": [{"$size": SETS_OR_EMPTY}, 0]},
+        {"$mergeObjects": [
+            {"$arrayElemAt": ["$$e.sets", -1]},
+            {"id": {"$add": [{"$max": "$$e.sets.id"}, 1]}, "completed": False}
+        ]},
+        DEFAULT_SET
+    ]}
+    routine = await db.routines.find_one_and_update(
+        routine_filter(day, user_id, exercise_id),
+        [{"$set": {"exercises": map_exercise(exercise_id, {"$concatArrays": [SETS_OR_EMPTY, [new_set]]})}}],
+        projection={"_id": 0, "exercises": {"$elemMatch": {"id": exercise_id}}},
+        return_document=ReturnDocument.AFTER
     )
+    if routine is None:
+        await raise_not_found(db, day, user_id, f"Exercise {exercise_id} not found")
+    routine_cache.update_exercise(user_id, day, routine["exercises"][0])
     
-    return {"message": "Set added successfully", "set": new_set}
+    return {"message": "Set added successfully", "set": routine["exercises"][0]["sets"][-1]}
 
 @router.delete("/routines/{day}/exercises/{exercise_id}/sets/{set_id}")
 async def delete_set(
@@ -257,27 +332,14 @@ async def delete_set(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Delete a specific set"""
-    routine = await db.routines.find_one({"day": day, "user_id": user_id})
-    if not routine:
-        raise HTTPException(status_code=404, detail=f"Routine for day {day} not found")
-    
-    updated = False
-    for exercise in routine["exercises"]:
-        if exercise["id"] == exercise_id:
-            original_length = len(exercise["sets"])
-            exercise["sets"] = [s for s in exercise["sets"] if s["id"] != set_id]
-            if len(exercise["sets"]) < original_length:
-                updated = True
-            break
-    
-    if not updated:
-        raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} or Set {set_id} not found")
-    
-    # Save the updated routine
-    await db.routines.update_one(
-        {"day": day, "user_id": user_id},
-        {"$set": {"exercises": routine["exercises"]}}
+    result = await db.routines.update_one(
+        routine_filter(day, user_id, exercise_id, set_id),
+        {"$pull": {"exercises.$[e].sets": {"id": set_id}}},
+        array_filters=[{"e.id": exercise_id}]
     )
+    if result.matched_count == 0:
+        await raise_not_found(db, day, user_id, f"Exercise {exercise_id} or Set {set_id} not found")
+    routine_cache.invalidate(user_id, day)
     
     return {"message": "Set deleted successfully"}
 
@@ -289,21 +351,13 @@ async def delete_exercise(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Delete an exercise from a routine"""
-    routine = await db.routines.find_one({"day": day, "user_id": user_id})
-    if not routine:
-        raise HTTPException(status_code=404, detail=f"Routine for day {day} not found")
-    
-    original_length = len(routine["exercises"])
-    routine["exercises"] = [e for e in routine["exercises"] if e["id"] != exercise_id]
-    
-    if len(routine["exercises"]) == original_length:
-        raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} not found")
-    
-    # Save the updated routine
-    await db.routines.update_one(
-        {"day": day, "user_id": user_id},
-        {"$set": {"exercises": routine["exercises"]}}
+    result = await db.routines.update_one(
+        routine_filter(day, user_id, exercise_id),
+        {"$pull": {"exercises": {"id": exercise_id}}}
     )
+    if result.matched_count == 0:
+        await raise_not_found(db, day, user_id, f"Exercise {exercise_id} not found")
+    routine_cache.invalidate(user_id, day)
     
     return {"message": "Exercise deleted successfully"}
 
@@ -346,6 +400,7 @@ async def copy_default_routines_for_user(
         default_routines.append(routine_copy)
     if default_routines:
         result = await db.routines.insert_many(default_routines)
+        routine_cache.invalidate(user_id)
         return {"message": f"Created {len(result.inserted_ids)} routines for user {user_id}"}
     else:
         raise HTTPException(status_code=404, detail="No default routines found")
@@ -360,6 +415,7 @@ async def reset_user_routines(
         {"user_id": user_id},
         {"$set": {"exercises.$[].sets.$[].completed": False}}
     )
+    routine_cache.invalidate(user_id)
     return {"message": "User routines reset"}
 
 # 루틴 완료시, 유저 progress, level 업데이트
@@ -369,7 +425,7 @@ async def complete_routine(
     user_id: int = Query(...),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    # 1. 모든 세트가 완료되었는지 확인
+    # 1. 모든 세트가 완료되었는지 확인 (진행도를 올리기 전이라 캐시가 아닌 DB에서 확인)
     routine = await db.routines.find_one({"day": day, "user_id": user_id})
     if not routine:
         raise HTTPException(status_code=404, detail="Routine not found")
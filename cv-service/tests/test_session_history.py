@@ -0,0 +1,30 @@
+import numpy as np
+
+from modules.session_history import (
+    MessageTable, RepStore, OVERFLOW_MESSAGE, OVERFLOW_MESSAGE_ID, MESSAGE_TABLE_SIZE
+)
+
+
+def test_message_table_is_capped_at_the_u2_range():
+    assert MESSAGE_TABLE_SIZE <= OVERFLOW_MESSAGE_ID
+    assert OVERFLOW_MESSAGE_ID == np.iinfo(RepStore.DTYPE["errors"].base).max
+
+
+def test_full_message_table_returns_the_sentinel():
+    table = MessageTable(max_size=2)
+    assert table.id("a") == 0
+    assert table.id("b") == 1
+    assert table.id("c") == OVERFLOW_MESSAGE_ID
+    assert table.id("a") == 0  # known messages keep their id
+    assert len(table) == 2
+    assert table.message(OVERFLOW_MESSAGE_ID) == OVERFLOW_MESSAGE
+
+
+def test_rep_store_keeps_working_after_overflow():
+    store = RepStore(capacity=4, table=MessageTable(max_size=1))
+    store.record(1, 0.5, ["knees"])
+    store.record(2, 0.5, ["hips", "knees"])
+
+    assert [r["errors"] for r in store.records()] == [["knees"], [OVERFLOW_MESSAGE, "knees"]]
+    # running totals count the real messages
+    assert store.error_counts == {"knees": 2, "hips": 1}
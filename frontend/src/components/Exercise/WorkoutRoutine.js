@@ -19,7 +19,8 @@ const isExerciseSupported = (exerciseName) => {
 };
 
 const WorkoutRoutine = () => {
-  const [routines, setRoutines] = useState([]);
+  const [routines, setRoutines] = useState([]);  // 불러온 일차의 전체 루틴만 보관
+  const [summaries, setSummaries] = useState([]);
   const [selectedDay, setSelectedDay] = useState(1);
   const [editingExercise, setEditingExercise] = useState(null);
   const [editingSet, setEditingSet] = useState(null);
@@ -167,13 +168,25 @@ const WorkoutRoutine = () => {
     fetchRoutines();
   }, [userId]);
 
-  const fetchRoutines = async () => {
+  // 선택한 일차의 운동/세트는 필요할 때만 불러옴
+  useEffect(() => {
+    if (summaries.some(s => s.day === selectedDay) && !routines.some(r => r.day === selectedDay)) {
+      fetchRoutine(selectedDay);
+    }
+  }, [summaries, selectedDay]);
+
+  // refresh: 사용자 루틴이 바뀐 뒤 다시 불러오기 - 선택한 일차는 새로 받을 때까지 화면에 유지하고 나머지 일차만 비움
+  const fetchRoutines = async (refresh = false) => {
     try {
-      setLoading(true);
+      if (!refresh) setLoading(true);
       setError(null);
-      const data = await workoutService.getAllRoutines(userId);
-      setRoutines(data);
+      const data = await workoutService.getRoutineSummaries(userId);
+      setRoutines(prev => refresh ? prev.filter(r => r.day === selectedDay) : []);
+      setSummaries(data);
       setLoading(false);
+      if (refresh && data.some(s => s.day === selectedDay)) {
+        await fetchRoutine(selectedDay);
+      }
     } catch (err) {
       setError('운동 루틴을 불러오는데 실패했습니다.');
       setLoading(false);
@@ -181,8 +194,26 @@ const WorkoutRoutine = () => {
     }
   };
 
+  const fetchRoutine = async (day) => {
+    try {
+      const routine = await workoutService.getRoutineByDay(day, userId);
+      setRoutines(prev => [...prev.filter(r => r.day !== day), routine]);
+    } catch (err) {
+      setError('운동 루틴을 불러오는데 실패했습니다.');
+      console.error('Failed to fetch routine:', err);
+    }
+  };
+
   const currentRoutine = routines.find(r => r.day === selectedDay);
 
+  // 불러온 일차는 화면의 세트 상태로, 나머지는 서버 요약으로 진행도 표시
+  const daySummary = (day) => {
+    const routine = routines.find(r => r.day === day);
+    if (!routine) return summaries.find(s => s.day === day);
+    const sets = routine.exercises.flatMap(exercise => exercise.sets);
+    return { total_sets: sets.length, completed_sets: sets.filter(set => set.completed).length };
+  };
+
   const handleCompleteSet = async (exerciseId, setId) => {
     try {
       await workoutService.toggleSetCompletion(selectedDay, exerciseId, setId);
@@ -225,7 +256,7 @@ const WorkoutRoutine = () => {
       await workoutService.resetUserRoutines(userId);
 
       // 루틴/진행상황 다시 불러오기
-      fetchRoutines();
+      fetchRoutines(true);
     } catch (err) {
       alert('아직 완료되지 않은 세트가 있습니다!');
     }
@@ -271,8 +302,21 @@ const WorkoutRoutine = () => {
     try {
       const result = await workoutService.addSet(selectedDay, exerciseId);
       
-      // Refresh routines to get the new set with proper ID from backend
-      await fetchRoutines();
+      // Append the set returned by the backend (it carries the new ID)
+      setRoutines(prev => prev.map(routine => {
+        if (routine.day === selectedDay) {
+          return {
+            ...routine,
+            exercises: routine.exercises.map(ex => {
+              if (ex.id === exerciseId) {
+                return { ...ex, sets: [...ex.sets, result.set] };
+              }
+              return ex;
+            })
+          };
+        }
+        return routine;
+      }));
     } catch (err) {
       console.error('Failed to add set:', err);
     }
@@ -306,7 +350,7 @@ const WorkoutRoutine = () => {
   try {
     await workoutService.resetUserRoutines(userId);
     // 루틴/진행상황 다시 불러오기
-    fetchRoutines();
+    fetchRoutines(true);
     alert('루틴이 리셋되었습니다!');
   } catch (err) {
     alert('루틴 리셋에 실패했습니다.');
@@ -393,7 +437,7 @@ const WorkoutRoutine = () => {
           {error}
         </div>
         <button 
-          onClick={fetchRoutines}
+          onClick={() => fetchRoutines()}
           style={{
             marginTop: '1rem',
             padding: '0.5rem 1rem',
@@ -428,15 +472,19 @@ const WorkoutRoutine = () => {
         루틴 리셋
       </button>
       <div style={styles.daySelection}>
-        {[1, 2, 3, 4].map(day => (
-          <button
-            key={day}
-            onClick={() => setSelectedDay(day)}
-            style={styles.dayButton(selectedDay === day)}
-          >
-            {day}일차
-          </button>
-        ))}
+        {[1, 2, 3, 4].map(day => {
+          const summary = daySummary(day);
+          return (
+            <button
+              key={day}
+              onClick={() => setSelectedDay(day)}
+              style={styles.dayButton(selectedDay === day)}
+            >
+              {day}일차
+              {summary && summary.total_sets > 0 && ` (${summary.completed_sets}/${summary.total_sets})`}
+            </button>
+          );
+        })}
       </div>
 
       {currentRoutine && (
@@ -14,9 +14,21 @@ class WorkoutService {
     }
   }
 
-  async getRoutineByDay(day) {
+  // 일차별 제목 / 세트 수 / 완료 세트 수만 (운동·세트 배열 없이)
+  async getRoutineSummaries(userId) {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/workout/routines/${day}`);
+      const response = await fetch(`${API_BASE_URL}/api/workout/routines/summary?user_id=${userId}`);
+      if (!response.ok) throw new Error('Failed to fetch routine summaries');
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching routine summaries:', error);
+      throw error;
+    }
+  }
+
+  async getRoutineByDay(day, userId) {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/workout/routines/${day}?user_id=${userId}`);
       if (!response.ok) throw new Error(`Failed to fetch routine for day ${day}`);
       return await response.json();
     } catch (error) {